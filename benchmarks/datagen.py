@@ -0,0 +1,208 @@
+import argparse
+import csv
+import io
+import random
+import time
+from collections import Counter
+from udsm import ballot, snapshots
+from udsm.authentication import utils
+from udsm.database import SessionLocal, engine
+
+# Synthetic university for capacity planning. Builds colleges, institutes and schools,
+# their units, departments and workers, then nominations and votes, and writes every
+# table with COPY instead of the single-row endpoints. Ids are reserved from each table's
+# sequence up front so rows can reference each other before they are written, and all
+# workers share one precomputed password hash.
+#
+#     python -m benchmarks.datagen --colleges 50 --departments 10 --workers-per-department 700
+#
+# writes about 350k workers and a million votes.
+
+CATEGORIES = ["junior", "senior", "administrative"]
+COPY_CHUNK_ROWS = 100000
+BALLOT_SIZE = 3
+
+
+def reserve_ids(cursor, table, count):
+    # take count values from the table's id sequence, returns the first
+    if not count:
+        return 0
+    cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", (table,))
+    first = cursor.fetchone()[0]
+    cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", (table, first + count - 1))
+    return first
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    written = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        written += 1
+        if written % COPY_CHUNK_ROWS == 0:
+            flush()
+    if buffer.tell():
+        flush()
+    return written
+
+
+class Generator:
+    def __init__(self, cursor, rng, args):
+        self.cursor = cursor
+        self.rng = rng
+        self.args = args
+        self.timings = {}
+
+    def timed(self, table, columns, rows):
+        started = time.perf_counter()
+        count = copy_rows(self.cursor, table, columns, rows)
+        self.timings[table] = (count, time.perf_counter() - started)
+
+    def units(self):
+        # (unit id, department ids or [None]) of every generated unit
+        args = self.args
+        kinds = [("colleges", "COLLEGE", "College", args.colleges), ("institutes", "INSTITUTE", "Institute", args.institutes), ("schools", "SCHOOL", "School", args.schools)]
+        first_unit = reserve_ids(self.cursor, "units", sum(count for _, _, _, count in kinds))
+        first_department = reserve_ids(self.cursor, "departments", args.colleges * args.departments)
+
+        units, unit_rows, department_rows = [], [], []
+        for table, unit_type, label, count in kinds:
+            first = reserve_ids(self.cursor, table, count)
+            self.timed(table, ["id", "name"], ((first + n, f"{label} {first + n}") for n in range(count)))
+            for n in range(count):
+                unit_id = first_unit + len(unit_rows)
+                unit_rows.append((unit_id, f"{label} {first + n}", unit_type, first + n))
+                if unit_type == "COLLEGE":
+                    department_ids = [first_department + len(department_rows) + d for d in range(args.departments)]
+                    department_rows.extend((department_id, f"Department {department_id}", first + n) for department_id in department_ids)
+                    units.append((unit_id, department_ids))
+                else:
+                    units.append((unit_id, [None]))
+
+        self.timed("units", ["id", "unit_name", "unit_type", "unit_id"], unit_rows)
+        self.timed("departments", ["id", "name", "college_id"], department_rows)
+        return units
+
+    def workers(self, units, password):
+        # worker ids grouped by (unit, department, category), the groups nominations and votes stay within
+        args = self.args
+        sizes = [(unit_id, department_id, args.workers_per_department if department_id else args.workers_per_unit)
+                 for unit_id, department_ids in units for department_id in department_ids]
+        first = reserve_ids(self.cursor, "workers", sum(size for _, _, size in sizes))
+
+        groups = {}
+        rows = []
+        for unit_id, department_id, size in sizes:
+            for _ in range(size):
+                worker_id = first + len(rows)
+                category = self.rng.choice(CATEGORIES)
+                groups.setdefault((unit_id, department_id, category), []).append(worker_id)
+                rows.append((worker_id, f"Worker {worker_id}", f"worker{worker_id}@{args.email_domain}", password, category, unit_id, department_id, "user"))
+
+        self.timed("workers", ["id", "name", "email", "password", "category", "unit_id", "department_id", "role"], rows)
+        return groups
+
+    def nominations(self, groups):
+        # each nominator gives weights 1, 2 and 3 to three peers of their own group
+        points = Counter()
+        rows = []
+        for (unit_id, department_id, category), worker_ids in groups.items():
+            if len(worker_ids) < 4:
+                continue
+            for nominator_id in worker_ids:
+                if self.rng.random() >= self.args.nomination_rate:
+                    continue
+                nominees = self.rng.sample(worker_ids, 4)
+                nominees = [nominee_id for nominee_id in nominees if nominee_id != nominator_id][:3]
+                for weight, nominee_id in zip((1, 2, 3), nominees):
+                    points[nominee_id] += weight
+                    rows.append((nominator_id, nominee_id, weight, category, department_id, unit_id))
+
+        self.timed("nominations", ["nominator_id", "nominee_id", "weight", "category", "department_id", "unit_id"], rows)
+        self.timed("nomination_submissions", ["nominator_id", "category"], sorted({(row[0], row[3]) for row in rows}))
+        return points
+
+    def votes(self, groups, points):
+        # the ballot of a group is its best nominated three, every worker of the unit and
+        # department may vote once per category
+        ballots = {key: sorted(worker_ids, key=lambda worker_id: -points[worker_id])[:BALLOT_SIZE] for key, worker_ids in groups.items()}
+        voters = {}
+        for (unit_id, department_id, _), worker_ids in groups.items():
+            voters.setdefault((unit_id, department_id), []).extend(worker_ids)
+
+        tallies = Counter()
+        rows = []
+        for (unit_id, department_id, category), candidates in ballots.items():
+            if not points[candidates[0]]:
+                continue
+            for voter_id in voters[unit_id, department_id]:
+                if self.rng.random() >= self.args.vote_rate:
+                    continue
+                votee_id = self.rng.choice(candidates)
+                tallies[votee_id, category, unit_id, department_id] += 1
+                rows.append((voter_id, votee_id, category, department_id, unit_id))
+
+        self.timed("votes", ["voter_id", "votee_id", "category", "department_id", "unit_id"], rows)
+        self.timed("vote_tallies", ["worker_id", "category", "unit_id", "department_id", "votes"],
+                   (key + (votes,) for key, votes in tallies.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic university with COPY for capacity planning")
+    parser.add_argument("--colleges", type=int, default=10)
+    parser.add_argument("--departments", type=int, default=10, help="departments per college")
+    parser.add_argument("--workers-per-department", type=int, default=400)
+    parser.add_argument("--institutes", type=int, default=5)
+    parser.add_argument("--schools", type=int, default=5)
+    parser.add_argument("--workers-per-unit", type=int, default=1000, help="workers of an institute or school, they have no departments")
+    parser.add_argument("--nomination-rate", type=float, default=0.9, help="share of workers that nominate")
+    parser.add_argument("--vote-rate", type=float, default=0.95, help="share of workers that vote in each category")
+    parser.add_argument("--password", default="password", help="password of every generated worker")
+    parser.add_argument("--email-domain", default="datagen.udsm.ac.tz")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--check-foreign-keys", action="store_true", help="keep foreign key checks on while loading")
+    parser.add_argument("--no-publish", action="store_true", help="skip publishing nomination results and building the ballot")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    password = utils.hash_password(args.password)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # the rows are consistent by construction, skipping the foreign key triggers roughly
+        # halves the load time but needs a superuser
+        cursor.execute("SELECT current_setting('is_superuser')")
+        if cursor.fetchone()[0] == "on" and not args.check_foreign_keys:
+            cursor.execute("SET session_replication_role = replica")
+        generator = Generator(cursor, random.Random(args.seed), args)
+        groups = generator.workers(generator.units(), password)
+        generator.votes(groups, generator.nominations(groups))
+        connection.commit()
+    finally:
+        connection.close()
+
+    for table, (count, seconds) in generator.timings.items():
+        print(f"{table:22} {count:>10} rows {seconds:8.2f}s")
+
+    if not args.no_publish:
+        published_at = time.perf_counter()
+        db = SessionLocal()
+        try:
+            keys = snapshots.publish_nomination_results(db)
+            ballot.build(db)
+        finally:
+            db.close()
+        print(f"published {keys} nomination results and the ballot in {time.perf_counter() - published_at:.2f}s")
+    print(f"done in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import httpx
+from sqlalchemy import insert
+from udsm import models
+from udsm.authentication import utils
+from udsm.database import SessionLocal
+
+# Election-day load test. Seeds a synthetic university into an empty database, then
+# drives the real app through a login storm, staged nominations and commits, voting and
+# results polling, and reports p50/p95/p99 latency and throughput per route.
+#
+# Run against a scratch database (it schedules periods and publishes results):
+#
+#     alembic upgrade head
+#     python -m benchmarks.loadtest --output before.json
+#     python -m benchmarks.loadtest --output after.json --compare before.json
+#
+# The app runs in-process by default, pass --base-url to load a running server instead.
+# --check-query-budgets runs the in-process app with QUERY_BUDGET_MODE=raise and ends with
+# a request to every budgeted route the phases don't reach, a route over its budget stops
+# the run with the statements it ran.
+
+CATEGORIES = ["junior", "senior", "administrative"]
+PASSWORD = "election-day"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def seed(rng, colleges, departments, workers_per_department):
+    db = SessionLocal()
+    try:
+        if db.query(models.Unit).count() or db.query(models.Worker).count():
+            sys.exit("The database already has units or workers, point the settings at a freshly migrated scratch database")
+
+        # every seeded worker shares one hash, hashing thousands of passwords is not what we measure
+        password = utils.hash_password(PASSWORD)
+        departments_by_unit = {}
+        for c in range(colleges):
+            college = models.College(name=f"College {c}")
+            db.add(college)
+            db.flush()
+            unit = models.Unit(unit_name=college.name, unit_type="COLLEGE", unit_id=college.id)
+            db.add(unit)
+            db.flush()
+            # departments are matched to the college through the worker's unit id
+            if unit.id != college.id:
+                sys.exit("Unit and college ids are out of step, run against a freshly migrated scratch database")
+            for d in range(departments):
+                department = models.Department(name=f"Department {c}.{d}", college_id=college.id)
+                db.add(department)
+                db.flush()
+                departments_by_unit.setdefault(unit.id, []).append(department.id)
+
+        first_unit = next(iter(departments_by_unit))
+        db.add(models.Worker(name="admin", email="admin@bench.udsm.ac.tz", password=password, category="admin",
+                             unit_id=first_unit, department_id=departments_by_unit[first_unit][0], role="admin"))
+        rows = []
+        for unit_id, department_ids in departments_by_unit.items():
+            for department_id in department_ids:
+                for _ in range(workers_per_department):
+                    n = len(rows)
+                    rows.append({
+                        "name": f"Worker {n}", "email": f"worker{n}@bench.udsm.ac.tz", "password": password,
+                        "category": rng.choice(CATEGORIES), "unit_id": unit_id, "department_id": department_id, "role": "user",
+                    })
+        db.execute(insert(models.Worker), rows)
+        db.commit()
+
+        workers = db.query(models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.unit_id, models.Worker.department_id)\
+                    .filter(models.Worker.role == "user")\
+                    .all()
+        return [tuple(worker) for worker in workers]
+    finally:
+        db.close()
+
+
+def load_ballot():
+    db = SessionLocal()
+    try:
+        ballot = {}
+        for unit_id, department_id, category, worker_id in db.query(
+            models.BallotEntry.unit_id, models.BallotEntry.department_id, models.BallotEntry.category, models.BallotEntry.worker_id
+        ):
+            ballot.setdefault((unit_id, department_id, category), []).append(worker_id)
+        return ballot
+    finally:
+        db.close()
+
+
+def percentile(ordered, fraction):
+    # nearest rank
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    async def request(self, client, method, route, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        self.samples.setdefault(route, []).append((started, time.perf_counter(), status))
+        return response
+
+    def report(self):
+        routes = {}
+        for route, samples in self.samples.items():
+            latencies = sorted((ended - started) * 1000 for started, ended, _ in samples)
+            window = max(ended for _, ended, _ in samples) - min(started for started, _, _ in samples)
+            statuses = {}
+            for _, _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            routes[route] = {
+                "requests": len(samples),
+                "errors": sum(1 for _, _, status in samples if not 200 <= status < 300),
+                "statuses": statuses,
+                "throughput_rps": round(len(samples) / window, 2) if window > 0 else 0.0,
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "max_ms": round(latencies[-1], 2),
+            }
+        return routes
+
+
+async def gather_limited(concurrency, coroutines):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(limited(coroutine) for coroutine in coroutines))
+
+
+@asynccontextmanager
+async def open_client(base_url, rate_limits, query_budgets):
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            yield client
+        return
+
+    from udsm.config import settings
+    # read when the app module builds its middleware
+    if query_budgets:
+        settings.query_budget_mode = "raise"
+    from udsm.main import app
+    # every simulated worker logs in from the same address, see --rate-limits
+    settings.rate_limit_enabled = rate_limits
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60) as client:
+            yield client
+
+
+async def login(recorder, client, email):
+    response = await recorder.request(client, "POST", "POST /login", "/login", data={"username": email, "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def nominate(recorder, client, rng, headers, worker, peers):
+    candidates = [peer for peer in peers if peer != worker[0]]
+    if headers is None or len(candidates) < 3:
+        return
+    for weight, nominee_id in zip((1, 2, 3), rng.sample(candidates, 3)):
+        await recorder.request(client, "POST", "POST /nominations/", "/nominations/", headers=headers,
+                               json={"category": worker[2], "nominee_id": nominee_id, "weight": weight})
+    await recorder.request(client, "POST", "POST /commit-nominations/", "/commit-nominations/", headers=headers)
+
+
+async def vote(recorder, client, rng, headers, worker, candidates):
+    if headers is None or not candidates:
+        return
+    await recorder.request(client, "POST", "POST /votes/", "/votes/", headers=headers,
+                           json={"category": worker[2], "votee_id": rng.choice(candidates)})
+
+
+async def poll(recorder, client, rng, headers):
+    if headers is None:
+        return
+    url = rng.choice(["/results", "/best_workers"])
+    await recorder.request(client, "GET", f"GET {url}", url, headers=headers)
+
+
+async def check_budgets(recorder, client, admin, headers, worker):
+    # the budgeted reads the election day phases leave out
+    _, _, category, unit_id, _ = worker
+    for route, url in [
+        ("GET /votes/", "/votes/"),
+        ("GET /votes/by-category/{category}", f"/votes/by-category/{category}"),
+        ("GET /nom_results/{category}", f"/nom_results/{category}"),
+        ("GET /nomination_results/all", "/nomination_results/all"),
+        ("GET /nominations/by-unit/{unit_id}/by-category/{category}", f"/nominations/by-unit/{unit_id}/by-category/{category}"),
+    ]:
+        await recorder.request(client, "GET", route, url, headers=headers)
+    await recorder.request(client, "GET", "GET /leaderboard", "/leaderboard", headers=admin)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    phases = {}
+
+    started = time.perf_counter()
+    workers = seed(rng, args.colleges, args.departments, args.workers_per_department)
+    phases["seed"] = time.perf_counter() - started
+    voters = rng.sample(workers, min(args.voters, len(workers)))
+
+    peers = {}
+    for worker_id, _, category, unit_id, department_id in workers:
+        peers.setdefault((unit_id, department_id, category), []).append(worker_id)
+
+    recorder = Recorder()
+    async with open_client(args.base_url, args.rate_limits, args.check_query_budgets) as client:
+        admin = await login(recorder, client, "admin@bench.udsm.ac.tz")
+        now = datetime.now(timezone.utc)
+        window = {"start_time": (now - timedelta(days=1)).strftime(TIME_FORMAT), "end_time": (now + timedelta(days=1)).strftime(TIME_FORMAT)}
+        release = {"release_time": (now + timedelta(days=1)).strftime(TIME_FORMAT)}
+        await recorder.request(client, "POST", "POST /schedule-nomination", "/schedule-nomination", headers=admin, json=window)
+        await recorder.request(client, "POST", "POST /schedule-nomination_result-release", "/schedule-nomination_result-release", headers=admin, json=release)
+        await recorder.request(client, "POST", "POST /schedule-vote_result-release", "/schedule-vote_result-release", headers=admin, json=release)
+
+        started = time.perf_counter()
+        tokens = await gather_limited(args.concurrency, [login(recorder, client, worker[1]) for worker in voters])
+        phases["login_storm"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await gather_limited(args.concurrency, [
+            nominate(recorder, client, random.Random(rng.random()), headers, worker, peers[worker[3], worker[4], worker[2]])
+            for headers, worker in zip(tokens, voters)
+        ])
+        phases["nominations"] = time.perf_counter() - started
+
+        await recorder.request(client, "POST", "POST /publish-nomination-results", "/publish-nomination-results", headers=admin)
+        await recorder.request(client, "POST", "POST /schedule-voting", "/schedule-voting", headers=admin, json=window)
+        ballot = load_ballot()
+
+        started = time.perf_counter()
+        await gather_limited(args.concurrency, [
+            vote(recorder, client, random.Random(rng.random()), headers, worker, ballot.get((worker[3], worker[4], worker[2])))
+            for headers, worker in zip(tokens, voters)
+        ])
+        phases["votes"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await gather_limited(args.concurrency, [
+            poll(recorder, client, random.Random(rng.random()), headers)
+            for _ in range(args.polls) for headers in tokens
+        ])
+        phases["polling"] = time.perf_counter() - started
+
+        if args.check_query_budgets:
+            await check_budgets(recorder, client, admin, tokens[0], voters[0])
+
+    return {
+        "started_at": now.isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "target": args.base_url or "in-process",
+        "config": {name: getattr(args, name) for name in ("colleges", "departments", "workers_per_department", "voters", "polls", "concurrency", "seed")},
+        "workers": len(workers),
+        "phase_seconds": {name: round(seconds, 3) for name, seconds in phases.items()},
+        "routes": recorder.report(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, baseline=None):
+    print(f"{result['workers']} workers, phases: " + ", ".join(f"{name} {seconds}s" for name, seconds in result["phase_seconds"].items()))
+    print(f"{'route':40} {'reqs':>6} {'errs':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, stats in sorted(result["routes"].items()):
+        line = f"{route:40} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+        before = (baseline or {}).get("routes", {}).get(route)
+        if before and before["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Election-day load test for the UDSM best worker API")
+    parser.add_argument("--colleges", type=int, default=10)
+    parser.add_argument("--departments", type=int, default=5, help="departments per college")
+    parser.add_argument("--workers-per-department", type=int, default=40)
+    parser.add_argument("--voters", type=int, default=500, help="workers that log in, nominate and vote")
+    parser.add_argument("--polls", type=int, default=4, help="results polls per voter")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting on for the in-process app")
+    parser.add_argument("--check-query-budgets", action="store_true", help="fail the run when a route goes over its query budget")
+    parser.add_argument("--output", default="loadtest.json")
+    parser.add_argument("--compare", help="earlier result file to show p95 changes against")
+    args = parser.parse_args()
+    if args.check_query_budgets and args.base_url:
+        parser.error("--check-query-budgets needs the in-process app")
+
+    from udsm.query_budget import QueryBudgetExceeded
+    try:
+        result = asyncio.run(run(args))
+    except QueryBudgetExceeded as error:
+        sys.exit(f"Query budget exceeded: {error}")
+    with open(args.output, "w") as file:
+        json.dump(result, file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_report(result, baseline)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
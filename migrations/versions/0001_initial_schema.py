@@ -0,0 +1,187 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 10:28:04.682047
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('colleges',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_colleges_id'), 'colleges', ['id'], unique=False)
+    op.create_index(op.f('ix_colleges_name'), 'colleges', ['name'], unique=False)
+    op.create_table('institutes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_institutes_id'), 'institutes', ['id'], unique=False)
+    op.create_index(op.f('ix_institutes_name'), 'institutes', ['name'], unique=False)
+    op.create_table('nom_result_release_periods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('release_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_nom_result_release_periods_id'), 'nom_result_release_periods', ['id'], unique=False)
+    op.create_table('nomination_periods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_nomination_periods_id'), 'nomination_periods', ['id'], unique=False)
+    op.create_table('result_release_periods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('release_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_result_release_periods_id'), 'result_release_periods', ['id'], unique=False)
+    op.create_table('schools',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_schools_id'), 'schools', ['id'], unique=False)
+    op.create_index(op.f('ix_schools_name'), 'schools', ['name'], unique=False)
+    op.create_table('units',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('unit_name', sa.String(), nullable=True),
+    sa.Column('unit_type', sa.Enum('COLLEGE', 'INSTITUTE', 'SCHOOL', name='unit_type_enum'), nullable=False),
+    sa.Column('unit_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('unit_type', 'unit_id', name='_unit_uc')
+    )
+    op.create_index(op.f('ix_units_id'), 'units', ['id'], unique=False)
+    op.create_index(op.f('ix_units_unit_name'), 'units', ['unit_name'], unique=False)
+    op.create_index(op.f('ix_units_unit_type'), 'units', ['unit_type'], unique=False)
+    op.create_table('voting_periods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_voting_periods_id'), 'voting_periods', ['id'], unique=False)
+    op.create_table('departments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('college_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['college_id'], ['colleges.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_departments_id'), 'departments', ['id'], unique=False)
+    op.create_index(op.f('ix_departments_name'), 'departments', ['name'], unique=False)
+    op.create_table('workers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('unit_id', sa.Integer(), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=True),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_index(op.f('ix_workers_id'), 'workers', ['id'], unique=False)
+    op.create_index(op.f('ix_workers_name'), 'workers', ['name'], unique=False)
+    op.create_table('nominations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nominator_id', sa.Integer(), nullable=False),
+    sa.Column('nominee_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=True),
+    sa.Column('unit_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['nominator_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['nominee_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('results',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.Integer(), nullable=False),
+    sa.Column('percentage', sa.Float(), server_default='0', nullable=True),
+    sa.ForeignKeyConstraint(['worker_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('voteresults',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.Integer(), nullable=False),
+    sa.Column('percentage', sa.Float(), server_default='0', nullable=True),
+    sa.ForeignKeyConstraint(['worker_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('votes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('voter_id', sa.Integer(), nullable=False),
+    sa.Column('votee_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=True),
+    sa.Column('unit_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+    sa.ForeignKeyConstraint(['votee_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['voter_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('votes')
+    op.drop_table('voteresults')
+    op.drop_table('results')
+    op.drop_table('nominations')
+    op.drop_index(op.f('ix_workers_name'), table_name='workers')
+    op.drop_index(op.f('ix_workers_id'), table_name='workers')
+    op.drop_table('workers')
+    op.drop_index(op.f('ix_departments_name'), table_name='departments')
+    op.drop_index(op.f('ix_departments_id'), table_name='departments')
+    op.drop_table('departments')
+    op.drop_index(op.f('ix_voting_periods_id'), table_name='voting_periods')
+    op.drop_table('voting_periods')
+    op.drop_index(op.f('ix_units_unit_type'), table_name='units')
+    op.drop_index(op.f('ix_units_unit_name'), table_name='units')
+    op.drop_index(op.f('ix_units_id'), table_name='units')
+    op.drop_table('units')
+    op.drop_index(op.f('ix_schools_name'), table_name='schools')
+    op.drop_index(op.f('ix_schools_id'), table_name='schools')
+    op.drop_table('schools')
+    op.drop_index(op.f('ix_result_release_periods_id'), table_name='result_release_periods')
+    op.drop_table('result_release_periods')
+    op.drop_index(op.f('ix_nomination_periods_id'), table_name='nomination_periods')
+    op.drop_table('nomination_periods')
+    op.drop_index(op.f('ix_nom_result_release_periods_id'), table_name='nom_result_release_periods')
+    op.drop_table('nom_result_release_periods')
+    op.drop_index(op.f('ix_institutes_name'), table_name='institutes')
+    op.drop_index(op.f('ix_institutes_id'), table_name='institutes')
+    op.drop_table('institutes')
+    op.drop_index(op.f('ix_colleges_name'), table_name='colleges')
+    op.drop_index(op.f('ix_colleges_id'), table_name='colleges')
+    op.drop_table('colleges')
+    sa.Enum(name='unit_type_enum').drop(op.get_bind(), checkfirst=True)
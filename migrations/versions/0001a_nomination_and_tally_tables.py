@@ -0,0 +1,100 @@
+"""nomination and tally tables
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 10:28:04.682047
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tables for the vote tallies, result snapshots and staged nominations. A database
+    # stamped at 0001 may come from a version of the app that already made some of them
+    # with create_all, those are left as they are.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'result_snapshots' not in existing:
+        op.create_table('result_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('department_id', sa.Integer(), nullable=True),
+        sa.Column('unit_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+        sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'result_snapshot_entries' not in existing:
+        op.create_table('result_snapshot_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.Integer(), nullable=False),
+        sa.Column('percentage', sa.Float(), server_default='0', nullable=True),
+        sa.ForeignKeyConstraint(['snapshot_id'], ['result_snapshots.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['worker_id'], ['workers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_result_snapshot_entries_snapshot_id'), 'result_snapshot_entries', ['snapshot_id'], unique=False)
+    if 'result_snapshot_heads' not in existing:
+        op.create_table('result_snapshot_heads',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('department_id', sa.Integer(), nullable=True),
+        sa.Column('unit_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+        sa.ForeignKeyConstraint(['snapshot_id'], ['result_snapshots.id'], ),
+        sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('unit_id', 'department_id', 'category', name='_result_snapshot_head_uc')
+        )
+    if 'staged_nominations' not in existing:
+        op.create_table('staged_nominations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('nominee_id', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('staged_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['nominee_id'], ['workers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['workers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_staged_nominations_staged_at'), 'staged_nominations', ['staged_at'], unique=False)
+        op.create_index(op.f('ix_staged_nominations_user_id'), 'staged_nominations', ['user_id'], unique=False)
+    if 'vote_tallies' not in existing:
+        op.create_table('vote_tallies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('votes', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('department_id', sa.Integer(), nullable=True),
+        sa.Column('unit_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+        sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+        sa.ForeignKeyConstraint(['worker_id'], ['workers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('worker_id', 'category', name='_vote_tally_uc')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('vote_tallies')
+    op.drop_index(op.f('ix_staged_nominations_user_id'), table_name='staged_nominations')
+    op.drop_index(op.f('ix_staged_nominations_staged_at'), table_name='staged_nominations')
+    op.drop_table('staged_nominations')
+    op.drop_table('result_snapshot_heads')
+    op.drop_index(op.f('ix_result_snapshot_entries_snapshot_id'), table_name='result_snapshot_entries')
+    op.drop_table('result_snapshot_entries')
+    op.drop_table('result_snapshots')
@@ -0,0 +1,36 @@
+"""hot query indexes
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18 10:28:16.202823
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # built concurrently so the live tables stay writable while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index('ix_nominations_nominator_category', 'nominations', ['nominator_id', 'category'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_nominations_nominee_id', 'nominations', ['nominee_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_votes_category_unit_department', 'votes', ['category', 'unit_id', 'department_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_votes_voter_category', 'votes', ['voter_id', 'category'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_workers_category_unit_department', 'workers', ['category', 'unit_id', 'department_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workers_category_unit_department', table_name='workers')
+    op.drop_index('ix_votes_voter_category', table_name='votes')
+    op.drop_index('ix_votes_category_unit_department', table_name='votes')
+    op.drop_index('ix_nominations_nominee_id', table_name='nominations')
+    op.drop_index('ix_nominations_nominator_category', table_name='nominations')
@@ -0,0 +1,48 @@
+"""vote and nomination uniqueness
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:41:12.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep the first of any duplicates written before the constraints existed
+    op.execute("""
+        DELETE FROM votes a USING votes b
+        WHERE a.voter_id = b.voter_id AND a.category = b.category AND a.id > b.id
+    """)
+    op.execute("""
+        DELETE FROM nominations a USING nominations b
+        WHERE a.nominator_id = b.nominator_id AND a.category = b.category AND a.nominee_id = b.nominee_id AND a.id > b.id
+    """)
+    # recount the tallies the removed votes were counted in
+    op.execute("DELETE FROM vote_tallies")
+    op.execute("""
+        INSERT INTO vote_tallies (worker_id, category, unit_id, department_id, votes)
+        SELECT votee_id, category, min(unit_id), min(department_id), count(id) FROM votes GROUP BY votee_id, category
+    """)
+    op.create_unique_constraint('_vote_voter_category_uc', 'votes', ['voter_id', 'category'])
+    op.create_unique_constraint('_nomination_uc', 'nominations', ['nominator_id', 'category', 'nominee_id'])
+    # the constraints' indexes cover the same lookups
+    op.drop_index('ix_votes_voter_category', table_name='votes')
+    op.drop_index('ix_nominations_nominator_category', table_name='nominations')
+
+
+def downgrade() -> None:
+    op.create_index('ix_nominations_nominator_category', 'nominations', ['nominator_id', 'category'], unique=False)
+    op.create_index('ix_votes_voter_category', 'votes', ['voter_id', 'category'], unique=False)
+    op.drop_constraint('_nomination_uc', 'nominations', type_='unique')
+    op.drop_constraint('_vote_voter_category_uc', 'votes', type_='unique')
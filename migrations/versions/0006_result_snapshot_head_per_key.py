@@ -0,0 +1,35 @@
+"""result snapshot head per key
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 10:55:26.627592
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL department ids never clashed in the constraint, keep the newest of any
+    # duplicate heads an institute or school got from concurrent publishes
+    op.execute("""
+        DELETE FROM result_snapshot_heads a USING result_snapshot_heads b
+        WHERE a.unit_id = b.unit_id AND a.department_id IS NULL AND b.department_id IS NULL
+          AND a.category = b.category AND a.id < b.id
+    """)
+    op.drop_constraint('_result_snapshot_head_uc', 'result_snapshot_heads', type_='unique')
+    op.create_index('_result_snapshot_head_uc', 'result_snapshot_heads', ['unit_id', sa.text('coalesce(department_id, 0)'), 'category'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('_result_snapshot_head_uc', table_name='result_snapshot_heads')
+    op.create_unique_constraint('_result_snapshot_head_uc', 'result_snapshot_heads', ['unit_id', 'department_id', 'category'])
@@ -0,0 +1,37 @@
+"""nomination submissions
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 10:58:56.640097
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('nomination_submissions',
+    sa.Column('nominator_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['nominator_id'], ['workers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('nominator_id', 'category')
+    )
+    # every category already nominated in counts as committed
+    op.execute("""
+        INSERT INTO nomination_submissions (nominator_id, category, created_at)
+        SELECT nominator_id, category, min(created_at) FROM nominations GROUP BY nominator_id, category
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('nomination_submissions')
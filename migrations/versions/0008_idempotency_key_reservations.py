@@ -0,0 +1,40 @@
+"""idempotency key reservations
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 11:02:41.581302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('fingerprint', sa.String(), nullable=True))
+    op.alter_column('idempotency_keys', 'status_code',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+    op.alter_column('idempotency_keys', 'body',
+               existing_type=postgresql.BYTEA(),
+               nullable=True)
+
+
+def downgrade() -> None:
+    # requests still running have nothing to keep
+    op.execute("DELETE FROM idempotency_keys WHERE status_code IS NULL")
+    op.alter_column('idempotency_keys', 'body',
+               existing_type=postgresql.BYTEA(),
+               nullable=False)
+    op.alter_column('idempotency_keys', 'status_code',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+    op.drop_column('idempotency_keys', 'fingerprint')
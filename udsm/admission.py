@@ -0,0 +1,162 @@
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from .authentication import oauth2
+from .config import settings
+
+# Admission control for the expensive routes. Token buckets limit how fast one caller
+# may hit a route (by user id, or by client address for /login) and answer 429 with
+# Retry-After, and a concurrency limit per route class sheds load with 503 once that
+# many requests of the class are already running in this process.
+#
+# Buckets are kept in memory per process, or with rate_limit_backend "sqlite" in a local
+# file shared by all worker processes on the host.
+
+
+def refill(bucket, now: float, rate: float, burst: int):
+    # (tokens left, seconds until the next token), a token is taken when one is available
+    tokens, updated = bucket if bucket else (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryRateLimitStore:
+    blocking = False
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, wait = refill(self._buckets.get(key), now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._evict(now, rate, burst)
+        return wait
+
+    def _evict(self, now, rate, burst):
+        # a bucket that has refilled is the same as no bucket
+        for key in [key for key, (tokens, updated) in self._buckets.items() if tokens + (now - updated) * rate >= burst]:
+            del self._buckets[key]
+
+
+class SqliteRateLimitStore:
+    # take waits on the file lock and disk, so it runs off the event loop
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        # wall clock time, the buckets are shared between processes
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            bucket = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = refill(bucket, now, rate, burst)
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.connection = connection
+        return connection
+
+
+def create_store(name: str):
+    if name == "memory":
+        return MemoryRateLimitStore()
+    if name == "sqlite":
+        return SqliteRateLimitStore(settings.rate_limit_sqlite_path)
+    raise ValueError(f"Unknown rate limit backend '{name}', expected memory or sqlite")
+
+
+rate_limit_store = create_store(settings.rate_limit_backend)
+
+
+def too_many_requests(wait: float):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, try again later",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))}
+    )
+
+
+class RateLimit:
+    # per_minute requests on average, burst of them back to back
+    def __init__(self, name: str, per_minute: int, burst: int):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    async def check(self, caller):
+        if not settings.rate_limit_enabled:
+            return
+        key = f"{self.name}:{caller}"
+        if rate_limit_store.blocking:
+            wait = await run_in_threadpool(rate_limit_store.take, key, self.rate, self.burst)
+        else:
+            wait = rate_limit_store.take(key, self.rate, self.burst)
+        if wait:
+            raise too_many_requests(wait)
+
+
+class UserRateLimit(RateLimit):
+    async def __call__(self, current_user=Depends(oauth2.get_current_user)):
+        await self.check(current_user['id'])
+
+
+class ClientRateLimit(RateLimit):
+    async def __call__(self, request: Request):
+        await self.check(request.client.host if request.client else "unknown")
+
+
+class ConcurrencyLimit:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.running = 0
+        self.shed = 0
+
+    async def __call__(self):
+        # all on the event loop, no lock needed
+        if self.running >= self.limit:
+            self.shed += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+
+    def stats(self):
+        return {"running": self.running, "limit": self.limit, "shed": self.shed}
+
+
+login_rate_limit = ClientRateLimit("login", settings.login_rate_limit_per_minute, settings.login_rate_limit_burst)
+vote_rate_limit = UserRateLimit("votes", settings.vote_rate_limit_per_minute, settings.vote_rate_limit_burst)
+login_concurrency = ConcurrencyLimit("login", settings.login_max_concurrency)
+vote_concurrency = ConcurrencyLimit("votes", settings.vote_max_concurrency)
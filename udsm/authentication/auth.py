@@ -1,23 +1,27 @@
 from fastapi import FastAPI, Response, status, HTTPException,Depends,APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from udsm import models, schemas
 from udsm.authentication import oauth2, utils
-from udsm.database import get_db
+from udsm.database import get_async_db
+from udsm.query_budget import query_budget
+from udsm.admission import login_concurrency, login_rate_limit
 
 router=APIRouter(tags=['Authentication'])
 
-@router.post('/login', response_model=schemas.Token)
-def login(user_credentials:OAuth2PasswordRequestForm= Depends(), db: Session=Depends(get_db)):
+@router.post('/login', response_model=schemas.Token, dependencies=[Depends(login_rate_limit), Depends(login_concurrency)])
+@query_budget(1)
+async def login(user_credentials:OAuth2PasswordRequestForm= Depends(), db: AsyncSession=Depends(get_async_db)):
       
 
-      usr=db.query(models.Worker).filter(models.Worker.email==user_credentials.username).first()
+      usr=(await db.execute(select(models.Worker).filter(models.Worker.email==user_credentials.username))).scalars().first()
   
       
       if not usr:     
           raise HTTPException(status_code=status.HTTP_403_FORBIDDEN , detail=f"Invalid cridentials, wrong email or password")
     
-      if not utils.verify(user_credentials.password,usr.password):
+      if not await utils.verify_async(user_credentials.password, usr.password):
           raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid cridentials, wrong email or password")
     
       access_token=oauth2.create_access_token(data={"id":usr.id, "role":usr.role, "category":usr.category, "department_id":usr.department_id,"unit_id":usr.unit_id})
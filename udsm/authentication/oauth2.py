@@ -1,3 +1,7 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from jose import jwt, JWSError, ExpiredSignatureError
@@ -22,7 +26,49 @@ def create_access_token(data:dict):
 
     return encoded_jwt
 
+class TokenCache:
+    # Bounded LRU of decoded claims keyed on the token digest, each entry lives until the token's exp
+    def __init__(self, max_entries:int):
+        self.max_entries=max_entries
+        self.hits=0
+        self.misses=0
+        self._lock=threading.Lock()
+        self._entries=OrderedDict()
+
+    def get(self, digest:bytes):
+        with self._lock:
+            entry=self._entries.get(digest)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses+=1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits+=1
+            return entry[0]
+
+    def put(self, digest:bytes, token_data:dict, exp):
+        if exp is None:
+            return
+        with self._lock:
+            self._entries[digest]=(token_data, exp)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+token_cache=TokenCache(settings.token_cache_size)
+
+
 def verify_access_token(token:str, credentials_exception):
+    digest=hashlib.sha256(token.encode()).digest()
+    token_data=token_cache.get(digest)
+    if token_data is not None:
+        return token_data
 
     try:
        payload= jwt.decode(token=token, key=SECRET_KEY, algorithms=ALGORITHM )
@@ -39,10 +85,11 @@ def verify_access_token(token:str, credentials_exception):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except JWSError:
         raise credentials_exception
+    token_cache.put(digest, token_data, payload.get("exp"))
     return token_data
 
 
-def get_current_user(token:str=Depends(oauth2_scheme)):
+async def get_current_user(token:str=Depends(oauth2_scheme)):
     credentials_exception=HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"could not validate cridentials", headers={"WWW-Authenticate":"Bearer"})
 
     return verify_access_token(token=token, credentials_exception=credentials_exception)
@@ -1,4 +1,9 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from ..config import settings
 
 
 pwd_context=CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -11,5 +16,71 @@ def verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password,hashed_password)
 
 
+# bcrypt runs on a dedicated process pool so it uses every core instead of holding the
+# GIL, and callers are turned away with a 503 once too many hashes are queued. Bulk
+# imports hash on a separate, smaller pool so they never queue ahead of logins
+_executor = None
+_import_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
 
 
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        return _executor
+
+
+def get_import_executor():
+    global _import_executor
+    with _executor_lock:
+        if _import_executor is None:
+            _import_executor = ProcessPoolExecutor(max_workers=settings.password_import_hash_workers)
+        return _import_executor
+
+
+def shutdown_executor():
+    global _executor, _import_executor
+    with _executor_lock:
+        for executor in (_executor, _import_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _import_executor = None
+
+
+def _reserve(count: int = 1):
+    global _pending
+    with _executor_lock:
+        if _pending + count > settings.password_hash_queue_limit:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, please try again shortly", headers={"Retry-After": "1"})
+        _pending += count
+
+
+def _release(count: int = 1):
+    global _pending
+    with _executor_lock:
+        _pending -= count
+
+
+async def _run(fn, *args):
+    _reserve()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+    finally:
+        _release()
+
+
+def hash_passwords(passwords):
+    # bulk hashing for imports, spread over the workers of the import pool
+    return list(get_import_executor().map(hash_password, passwords, chunksize=16))
+
+
+async def hash_password_async(password:str):
+    return await _run(hash_password, password)
+
+
+async def verify_async(plain_password, hashed_password):
+    return await _run(verify, plain_password, hashed_password)
@@ -0,0 +1,75 @@
+import threading
+import time
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .database import primary_session
+
+# The ballot is the top three nominees of every (unit, department, category), taken from
+# the published nomination snapshots. It is materialized into ballot_entries when voting
+# is scheduled and kept in memory as sets, so validating a vote is a set lookup.
+
+BALLOT_SIZE = 3
+
+
+class Ballot:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._candidates = None
+        self._loaded_at = 0.0
+        # bumped on every build, a load that raced one is not kept
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._candidates = None
+
+    def is_eligible(self, db: Session, unit_id: int, department_id, category: str, worker_id: int):
+        candidates = self._candidates
+        if candidates is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            candidates = self._load(db)
+        return worker_id in candidates.get((unit_id, department_id, category), ())
+
+    def _load(self, db: Session):
+        generation = self._generation
+        candidates = {}
+        with primary_session(db) as db:
+            rows = db.query(models.BallotEntry.unit_id, models.BallotEntry.department_id, models.BallotEntry.category, models.BallotEntry.worker_id).all()
+        for unit_id, department_id, category, worker_id in rows:
+            candidates.setdefault((unit_id, department_id, category), set()).add(worker_id)
+        candidates = {key: frozenset(worker_ids) for key, worker_ids in candidates.items()}
+
+        with self._lock:
+            if generation == self._generation:
+                self._candidates = candidates
+                self._loaded_at = time.monotonic()
+        return candidates
+
+
+ballot = Ballot(settings.ballot_cache_ttl_seconds)
+
+
+def build(db: Session):
+    ranked = select(
+        models.ResultSnapshotEntry.worker_id,
+        models.ResultSnapshotHead.category,
+        models.ResultSnapshotHead.department_id,
+        models.ResultSnapshotHead.unit_id,
+        func.row_number().over(
+            partition_by=models.ResultSnapshotHead.id,
+            order_by=(models.ResultSnapshotEntry.percentage.desc(), models.ResultSnapshotEntry.worker_id)
+        ).label("position")
+    ).join(models.ResultSnapshotHead, models.ResultSnapshotHead.snapshot_id == models.ResultSnapshotEntry.snapshot_id)\
+     .subquery()
+
+    db.query(models.BallotEntry).delete(synchronize_session=False)
+    db.execute(insert(models.BallotEntry).from_select(
+        ["worker_id", "category", "department_id", "unit_id"],
+        select(ranked.c.worker_id, ranked.c.category, ranked.c.department_id, ranked.c.unit_id).where(ranked.c.position <= BALLOT_SIZE)
+    ))
+    db.commit()
+    ballot.invalidate()
+    return db.query(models.BallotEntry).count()
@@ -9,6 +9,40 @@ class Settings(BaseSettings):
     secret_key:str
     algorithm:str
     access_token_expire_minutes:int
+    token_cache_size:int=4096
+    database_pool_size:int=5
+    database_max_overflow:int=10
+    database_pool_timeout:int=30
+    database_pool_recycle:int=1800
+    database_pool_pre_ping:bool=True
+    database_replica_url:str=""
+    replica_max_lag_seconds:int=10
+    replica_check_interval_seconds:int=5
+    password_hash_workers:int=2
+    password_hash_queue_limit:int=64
+    password_import_hash_workers:int=1
+    period_cache_ttl_seconds:int=30
+    ballot_cache_ttl_seconds:int=30
+    leaderboard_cache_ttl_seconds:int=30
+    hierarchy_cache_ttl_seconds:int=300
+    page_size_default:int=50
+    page_size_max:int=200
+    nomination_staging_backend:str="database"
+    nomination_staging_ttl_seconds:int=3600
+    vote_write_batch_size:int=200
+    vote_write_flush_interval_ms:int=5
+    query_budget_mode:str="off"
+    idempotency_backend:str="database"
+    idempotency_ttl_seconds:int=86400
+    rate_limit_enabled:bool=True
+    rate_limit_backend:str="memory"
+    rate_limit_sqlite_path:str="/tmp/udsm-rate-limits.sqlite3"
+    login_rate_limit_per_minute:int=20
+    login_rate_limit_burst:int=10
+    vote_rate_limit_per_minute:int=30
+    vote_rate_limit_burst:int=10
+    login_max_concurrency:int=64
+    vote_max_concurrency:int=256
 
     class Config:
         env_file= ".env"
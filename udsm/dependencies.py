@@ -1,77 +1,93 @@
+import threading
+import time
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from udsm import models
-import pytz
+from udsm.config import settings
+from udsm.database import primary_session
+
+
+class PeriodRegistry:
+    # Keeps the latest nomination, voting and release windows in memory. The admin
+    # schedule endpoints invalidate it right away, the TTL lets other processes catch up.
+    # It always loads from the primary, also for routes reading from the replica.
+    period_models = {
+        "nomination": models.NominationPeriod,
+        "voting": models.VotingPeriod,
+        "nomination_result_release": models.NominationResultReleasePeriod,
+        "result_release": models.ResultReleasePeriod,
+    }
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._windows = None
+        self._loaded_at = 0.0
+        # bumped on every invalidate, a load that raced one is not kept
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._windows = None
+
+    def get(self, db: Session, name: str):
+        windows = self._windows
+        if windows is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            windows = self._load(db)
+        return windows[name]
+
+    def _load(self, db: Session):
+        generation = self._generation
+        windows = {}
+        with primary_session(db) as db:
+            for name, model in self.period_models.items():
+                # Fetch the most recent period
+                period = db.query(model).order_by(model.created_at.desc()).first()
+                if not period:
+                    windows[name] = None
+                elif hasattr(period, "release_time"):
+                    windows[name] = (period.release_time,)
+                else:
+                    windows[name] = (period.start_time, period.end_time)
+
+        with self._lock:
+            if generation == self._generation:
+                self._windows = windows
+                self._loaded_at = time.monotonic()
+        return windows
+
+
+period_registry = PeriodRegistry(settings.period_cache_ttl_seconds)
+
 
 def check_nomination_period(db: Session):
-    # Get the current time in UTC using pytz
-    now_utc = datetime.now(pytz.timezone('Africa/Nairobi'))
-    print(now_utc)
-
-    # Fetch the most recent nomination period
-    period = db.query(models.NominationPeriod).order_by(models.NominationPeriod.created_at.desc()).first()
-
-    if period:
-        # Ensure the period times are in UTC
-        start_time_utc = period.start_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        end_time_utc = period.end_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        print(period.end_time)
-    else:
-        start_time_utc = end_time_utc = None
-
-    if not period or not (start_time_utc <= now_utc <= end_time_utc):
+    now_utc = datetime.now(timezone.utc)
+    period = period_registry.get(db, "nomination")
+
+    if not period or not (period[0] <= now_utc <= period[1]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nominations are not allowed at this time")
 
     
 
 def check_voting_period(db: Session):
-     # Get the current time in UTC using pytz
-    now_utc = datetime.now(pytz.timezone('Africa/Nairobi'))
-    print(now_utc)
-
-    # Fetch the most recent nomination period
-    period = db.query(models.VotingPeriod).order_by(models.VotingPeriod.created_at.desc()).first()
-
-    if period:
-        # Ensure the period times are in UTC
-        start_time_utc = period.start_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        end_time_utc = period.end_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        print(period.end_time)
-    else:
-        start_time_utc = end_time_utc = None
-
-    if not period or not (start_time_utc <= now_utc <= end_time_utc):
+    now_utc = datetime.now(timezone.utc)
+    period = period_registry.get(db, "voting")
+
+    if not period or not (period[0] <= now_utc <= period[1]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Voting is not allowed at this time")
 
 def check_result_release_period(db: Session):
-    now_utc = datetime.now(pytz.timezone('Africa/Nairobi'))
+    now_utc = datetime.now(timezone.utc)
+    period = period_registry.get(db, "result_release")
 
-
-    # Fetch the most recent nomination period
-    period = db.query(models.ResultReleasePeriod).order_by(models.ResultReleasePeriod.created_at.desc()).first()
-
-    if period:
-        # Ensure the period times are in UTC
-        release_time_utc = period.release_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        
-    
-
-    if not period or not (now_utc <= release_time_utc):
+    if not period or not (now_utc <= period[0]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Results are not yet released")
     
 def check_nom_result_release_period(db: Session):
-    now_utc = datetime.now(pytz.timezone('Africa/Nairobi'))
-
-
-    # Fetch the most recent nomination period
-    period = db.query(models.NominationResultReleasePeriod).order_by(models.NominationResultReleasePeriod.created_at.desc()).first()
-
-    if period:
-        # Ensure the period times are in UTC
-        release_time_utc = period.release_time.astimezone(pytz.timezone('Africa/Nairobi'))
-        
-    
+    now_utc = datetime.now(timezone.utc)
+    period = period_registry.get(db, "nomination_result_release")
 
-    if not period or not (now_utc <= release_time_utc):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nomination results are not yet released")
\ No newline at end of file
+    if not period or not (now_utc <= period[0]):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nomination results are not yet released")
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .database import primary_session
+
+# The organisational hierarchy kept in memory. Units with the college, institute or school
+# they stand for, and departments with their college, change a handful of times a year, so
+# they are loaded into tuples keyed by id and the unit and department checks of the
+# nomination routes are dict reads. The college, department, institute and school routers
+# invalidate it on write, and ttl bounds how long another process may serve stale entries.
+# It always loads from the primary, also for routes reading from the replica.
+
+UnitEntry = namedtuple("UnitEntry", "id unit_name unit_type unit_id parent_name")
+DepartmentEntry = namedtuple("DepartmentEntry", "id name college_id college_name")
+
+PARENTS = (("COLLEGE", models.College), ("INSTITUTE", models.Institute), ("SCHOOL", models.School))
+
+
+class Hierarchy:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # units and departments load separately, a route only pays for what it reads
+        self._units = None
+        self._departments = None
+        # bumped on every write, a load that raced one is not kept
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._units = None
+            self._departments = None
+
+    def _fresh(self, loaded):
+        return loaded is not None and time.monotonic() - loaded[0] <= self.ttl_seconds
+
+    def unit(self, db: Session, unit_id: int):
+        # the unit standing for college, institute or school unit_id, the lowest unit id
+        # wins when several types share it
+        units = self._units
+        if not self._fresh(units):
+            units = self._load_units(db)
+        return units[1].get(unit_id)
+
+    def department(self, db: Session, department_id: int):
+        departments = self._departments
+        if not self._fresh(departments):
+            departments = self._load_departments(db)
+        return departments[1].get(department_id)
+
+    def _load_units(self, db: Session):
+        generation = self._generation
+        query = select(
+            models.Unit.id, models.Unit.unit_name, models.Unit.unit_type, models.Unit.unit_id,
+            func.coalesce(*(parent.name for _, parent in PARENTS))
+        )
+        for unit_type, parent in PARENTS:
+            query = query.outerjoin(parent, and_(models.Unit.unit_type == unit_type, parent.id == models.Unit.unit_id))
+
+        by_unit_id = {}
+        with primary_session(db) as db:
+            for row in db.execute(query.order_by(models.Unit.id)):
+                by_unit_id.setdefault(row.unit_id, UnitEntry(*row))
+
+        units = (time.monotonic(), by_unit_id)
+        with self._lock:
+            if generation == self._generation:
+                self._units = units
+        return units
+
+    def _load_departments(self, db: Session):
+        generation = self._generation
+        with primary_session(db) as db:
+            rows = db.execute(
+                select(models.Department.id, models.Department.name, models.Department.college_id, models.College.name)
+                .outerjoin(models.College, models.College.id == models.Department.college_id)
+            )
+            departments = (time.monotonic(), {row[0]: DepartmentEntry(*row) for row in rows})
+        with self._lock:
+            if generation == self._generation:
+                self._departments = departments
+        return departments
+
+
+hierarchy = Hierarchy(settings.hierarchy_cache_ttl_seconds)
@@ -0,0 +1,248 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from . import models
+from .authentication import oauth2
+from .database import async_engine
+
+# Idempotency-Key support for vote and nomination submissions. The first request with a
+# (user, route, key) reserves it before the route runs, and its response is stored for
+# ttl seconds if it succeeds. A retry gets that response back without running the route,
+# a retry while the first request is still running gets 409, and the same key with a
+# different body gets 422. Only 2xx responses are stored, a failed attempt releases the
+# key so it can be retried.
+#
+# "database" shares the keys between all worker processes, "memory" is a single-process
+# stand-in for development.
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+IDEMPOTENT_ROUTES = {"/votes/", "/nominations/", "/commit-nominations/"}
+# a reservation older than this belongs to a request that never finished, e.g. its
+# process died, and is taken over by the next request with the key
+PENDING_TIMEOUT_SECONDS = 60
+PURGE_INTERVAL_SECONDS = 60
+
+RESERVED, REPLAY, IN_FLIGHT, MISMATCH = "reserved", "replay", "in_flight", "mismatch"
+
+StoredResponse = Tuple[int, bytes]
+
+
+def outcome(fingerprint: str, stored_fingerprint: Optional[str], response: Optional[StoredResponse]):
+    # what a request finds under a key that is already taken
+    if stored_fingerprint is not None and stored_fingerprint != fingerprint:
+        return MISMATCH, None
+    if response is None:
+        return IN_FLIGHT, None
+    return REPLAY, response
+
+
+class MemoryIdempotencyStore:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # [stored at, fingerprint, response or None while in flight]
+        self._entries: Dict[Tuple[int, str, str], List] = {}
+        self._purged_at = time.monotonic()
+
+    async def reserve(self, user_id: int, route: str, key: str, fingerprint: str):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get((user_id, route, key))
+            if entry and now - entry[0] < (self.ttl_seconds if entry[2] else PENDING_TIMEOUT_SECONDS):
+                return outcome(fingerprint, entry[1], entry[2])
+            self._entries[(user_id, route, key)] = [now, fingerprint, None]
+            return RESERVED, None
+
+    async def complete(self, user_id: int, route: str, key: str, response: StoredResponse):
+        with self._lock:
+            entry = self._entries.get((user_id, route, key))
+            if entry:
+                entry[2] = response
+
+    async def release(self, user_id: int, route: str, key: str):
+        with self._lock:
+            entry = self._entries.get((user_id, route, key))
+            if entry and entry[2] is None:
+                del self._entries[(user_id, route, key)]
+
+    def _purge(self, now):
+        if now - self._purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        cutoff = now - self.ttl_seconds
+        for entry_key in [entry_key for entry_key, (stored_at, _, _) in self._entries.items() if stored_at < cutoff]:
+            del self._entries[entry_key]
+
+
+class DatabaseIdempotencyStore:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._purged_at = time.monotonic()
+
+    def _match(self, user_id: int, route: str, key: str):
+        return and_(models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.route == route, models.IdempotencyKey.key == key)
+
+    async def reserve(self, user_id: int, route: str, key: str, fingerprint: str):
+        await self._purge()
+        now = datetime.now(timezone.utc)
+        stmt = insert(models.IdempotencyKey).values(user_id=user_id, route=route, key=key, fingerprint=fingerprint, created_at=now)
+        # an expired key, or the reservation of a request that never finished, is taken over
+        stmt = stmt.on_conflict_do_update(
+            constraint='_idempotency_key_uc',
+            set_={"fingerprint": fingerprint, "status_code": None, "body": None, "created_at": now},
+            where=or_(
+                models.IdempotencyKey.created_at < now - timedelta(seconds=self.ttl_seconds),
+                and_(models.IdempotencyKey.status_code.is_(None), models.IdempotencyKey.created_at < now - timedelta(seconds=PENDING_TIMEOUT_SECONDS))
+            )
+        ).returning(models.IdempotencyKey.id)
+
+        async with async_engine.begin() as connection:
+            if (await connection.execute(stmt)).first():
+                return RESERVED, None
+            row = (await connection.execute(
+                select(models.IdempotencyKey.fingerprint, models.IdempotencyKey.status_code, models.IdempotencyKey.body)
+                .where(self._match(user_id, route, key))
+            )).first()
+        if row is None:
+            # released by a failed first attempt just now, the retry may try again
+            return IN_FLIGHT, None
+        return outcome(fingerprint, row.fingerprint, (row.status_code, row.body) if row.status_code is not None else None)
+
+    async def complete(self, user_id: int, route: str, key: str, response: StoredResponse):
+        status_code, body = response
+        async with async_engine.begin() as connection:
+            await connection.execute(
+                update(models.IdempotencyKey).where(self._match(user_id, route, key)).values(status_code=status_code, body=body)
+            )
+
+    async def release(self, user_id: int, route: str, key: str):
+        async with async_engine.begin() as connection:
+            await connection.execute(
+                delete(models.IdempotencyKey).where(self._match(user_id, route, key), models.IdempotencyKey.status_code.is_(None))
+            )
+
+    async def _purge(self):
+        # expired keys are dropped once a minute per process, not on every request
+        now = time.monotonic()
+        if now - self._purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        async with async_engine.begin() as connection:
+            await connection.execute(delete(models.IdempotencyKey).where(
+                models.IdempotencyKey.created_at < datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+            ))
+
+
+stores = {
+    "memory": MemoryIdempotencyStore,
+    "database": DatabaseIdempotencyStore,
+}
+
+
+def create_store(name: str, ttl_seconds: int):
+    if name not in stores:
+        raise ValueError(f"Unknown idempotency backend '{name}', expected one of {', '.join(stores)}")
+    return stores[name](ttl_seconds)
+
+
+def request_user_id(headers: dict):
+    # the caller's id from the bearer token, None lets the route reject the request itself
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return oauth2.verify_access_token(token, HTTPException(status_code=401))["id"]
+    except HTTPException:
+        return None
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+async def send_json(send, status_code: int, body: bytes, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER, b"").decode("latin-1")
+        user_id = request_user_id(headers) if key else None
+        if not key or len(key) > MAX_KEY_LENGTH or user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        if body is None:
+            # the client went away before sending the whole body
+            return
+
+        route = scope["path"]
+        state, stored = await self.store.reserve(user_id, route, key, hashlib.sha256(body).hexdigest())
+        if state == REPLAY:
+            status_code, stored_body = stored
+            await send_json(send, status_code, stored_body, [(REPLAYED_HEADER.lower().encode(), b"true")])
+            return
+        if state == IN_FLIGHT:
+            await send_json(send, 409, orjson.dumps({"detail": "A request with this Idempotency-Key is still being processed"}), [(b"retry-after", b"1")])
+            return
+        if state == MISMATCH:
+            await send_json(send, 422, orjson.dumps({"detail": "This Idempotency-Key was already used with a different request body"}))
+            return
+
+        # the body was read to fingerprint it, hand it to the route as it came
+        body_sent = False
+        async def replay_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": None, "body": bytearray()}
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await self.store.release(user_id, route, key)
+            raise
+        if response["status"] is not None and 200 <= response["status"] < 300:
+            await self.store.complete(user_id, route, key, (response["status"], bytes(response["body"])))
+        else:
+            await self.store.release(user_id, route, key)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from collections import Counter
+from fastapi import HTTPException, status
+from sqlalchemy.dialects.postgresql import insert
+from . import models
+from .config import settings
+from .database import async_engine
+
+# Write-behind vote ingestion. Validated votes are queued and a single writer task
+# inserts them in batches, one transaction and one commit per batch. A caller is only
+# acknowledged once the batch holding its vote has committed, so a 200 still means the
+# vote is durable, but thousands of concurrent voters share a handful of fsyncs.
+
+logger = logging.getLogger(__name__)
+
+
+def already_voted():
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Already voted in this category")
+
+
+class VoteWriter:
+    def __init__(self, batch_size: int, flush_interval_ms: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        # also restarts a writer that died, the votes still queued are kept for it
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        # flush what is already queued, then stop the writer
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        self._queue = None
+
+    async def submit(self, values: dict) -> dict:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((values, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # keep collecting until the batch is full or the flush interval is up
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as error:
+                # never let one batch stop the writer, its callers get the error
+                logger.exception("Vote batch of %d failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def _flush(self, batch):
+        # a voter gets one vote per category, a second one in the same batch is refused
+        accepted = {}
+        for values, future in batch:
+            # the request was cancelled while it waited, its vote is not written
+            if future.done():
+                continue
+            key = (values["voter_id"], values["category"])
+            if key in accepted:
+                future.set_exception(already_voted())
+            else:
+                accepted[key] = (values, future)
+
+        rows = [values for values, _ in accepted.values()]
+        if not rows:
+            return
+        try:
+            async with async_engine.begin() as connection:
+                # votes that hit the unique constraint are skipped and missing from the returned rows
+                inserted = await connection.execute(
+                    insert(models.Vote).values(rows)
+                    .on_conflict_do_nothing(constraint='_vote_voter_category_uc')
+                    .returning(models.Vote.id, models.Vote.voter_id, models.Vote.category, models.Vote.created_at)
+                )
+                saved = {(row.voter_id, row.category): row for row in inserted}
+
+                # one upsert per candidate instead of one per vote
+                counts = Counter(
+                    (row["votee_id"], row["category"], row["unit_id"], row["department_id"])
+                    for row in rows if (row["voter_id"], row["category"]) in saved
+                )
+                if counts:
+                    stmt = insert(models.VoteTally).values([
+                        {"worker_id": worker_id, "category": category, "unit_id": unit_id, "department_id": department_id, "votes": votes}
+                        for (worker_id, category, unit_id, department_id), votes in counts.items()
+                    ])
+                    await connection.execute(stmt.on_conflict_do_update(
+                        constraint='_vote_tally_uc',
+                        set_={"votes": models.VoteTally.votes + stmt.excluded.votes}
+                    ))
+        except Exception as error:
+            for _, future in accepted.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for key, (values, future) in accepted.items():
+            if future.done():
+                continue
+            if key in saved:
+                future.set_result({**values, "id": saved[key].id, "created_at": saved[key].created_at})
+            else:
+                future.set_exception(already_voted())
+
+
+vote_writer = VoteWriter(settings.vote_write_batch_size, settings.vote_write_flush_interval_ms)
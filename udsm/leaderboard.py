@@ -0,0 +1,91 @@
+import threading
+import time
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+
+# University-wide vote leaderboard for admins. Every (unit, department, category) is ranked
+# in one statement over the vote tallies with window functions, instead of running the
+# per-unit results routes once per unit, and the ranking is cached for ttl seconds.
+# Percentages are shares of the votes cast in the candidate's own unit, department and
+# category.
+
+
+def ranking(db: Session, top: int):
+    partition = (models.VoteTally.unit_id, models.VoteTally.department_id, models.VoteTally.category)
+    ranked = select(
+        models.VoteTally.unit_id,
+        models.VoteTally.department_id,
+        models.VoteTally.category,
+        models.VoteTally.worker_id,
+        models.VoteTally.votes,
+        func.rank().over(partition_by=partition, order_by=models.VoteTally.votes.desc()).label("rank"),
+        func.sum(models.VoteTally.votes).over(partition_by=partition).label("total")
+    ).filter(models.VoteTally.votes > 0).subquery()
+
+    rows = db.execute(
+        select(
+            ranked.c.unit_id,
+            models.Unit.unit_name,
+            ranked.c.department_id,
+            models.Department.name.label("department_name"),
+            ranked.c.category,
+            ranked.c.rank,
+            ranked.c.worker_id,
+            models.Worker.name,
+            models.Worker.email,
+            ranked.c.votes,
+            ranked.c.total
+        ).join(models.Worker, models.Worker.id == ranked.c.worker_id)
+         .join(models.Unit, models.Unit.id == ranked.c.unit_id)
+         .outerjoin(models.Department, models.Department.id == ranked.c.department_id)
+         .filter(ranked.c.rank <= top)
+         .order_by(ranked.c.unit_id, ranked.c.department_id, ranked.c.category, ranked.c.rank, ranked.c.worker_id)
+    ).all()
+
+    return [
+        {
+            "unit_id": row.unit_id,
+            "unit_name": row.unit_name,
+            "department_id": row.department_id,
+            "department_name": row.department_name,
+            "category": row.category,
+            "rank": row.rank,
+            "worker_id": row.worker_id,
+            "name": row.name,
+            "email": row.email,
+            "votes": row.votes,
+            "percentage": round(row.votes / row.total * 100, 2),
+        }
+        for row in rows
+    ]
+
+
+class Leaderboard:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._rankings = {}
+        # bumped on every invalidate, a ranking that raced one is not kept
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._rankings = {}
+
+    def get(self, db: Session, top: int):
+        cached = self._rankings.get(top)
+        if cached and time.monotonic() - cached[0] <= self.ttl_seconds:
+            return cached[1]
+
+        generation = self._generation
+        entries = ranking(db, top)
+        with self._lock:
+            if generation == self._generation:
+                self._rankings[top] = (time.monotonic(), entries)
+        return entries
+
+
+leaderboard = Leaderboard(settings.leaderboard_cache_ttl_seconds)
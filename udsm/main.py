@@ -1,29 +1,41 @@
 
 from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from . import models, schemas
-from .database import get_db, engine
-from .routers import college, nomination, worker, department, vote, school, institute, college, results, schedule
-from .authentication import auth
+from .database import get_db, engine, async_engine
+from .routers import college, nomination, worker, department, vote, school, institute, college, results, schedule, export, metrics
+from .authentication import auth, utils
 from fastapi.middleware.cors import CORSMiddleware
+from .pagination import NEXT_CURSOR_HEADER
+from .ingest import vote_writer
+from .metrics import MetricsMiddleware
+from .query_budget import QueryBudgetMiddleware
+from .idempotency import REPLAYED_HEADER, IdempotencyMiddleware, create_store
+from .config import settings
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 origins=[
   "*"
 ]
 
 
+# budgets count the route's own queries, not the idempotency store's
+if settings.query_budget_mode != "off":
+    app.add_middleware(QueryBudgetMiddleware, mode=settings.query_budget_mode)
+app.add_middleware(IdempotencyMiddleware, store=create_store(settings.idempotency_backend, settings.idempotency_ttl_seconds))
+# added after the idempotency layer so replays and its 409/422 answers get CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REPLAYED_HEADER],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(nomination.router)
 app.include_router(worker.router)
@@ -36,6 +48,20 @@ app.include_router(college.router)
 app.include_router(institute.router)
 app.include_router(school.router)
 app.include_router(results.router)
+app.include_router(export.router)
+app.include_router(metrics.router)
+
+
+@app.on_event("startup")
+async def startup():
+    vote_writer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await vote_writer.stop()
+    await async_engine.dispose()
+    utils.shutdown_executor()
 
 
 
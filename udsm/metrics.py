@@ -0,0 +1,149 @@
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request and database metrics in the Prometheus text format. MetricsMiddleware times
+# every request against the route template it matched, and the cursor hooks charge each
+# query to the request that ran it, so a slow route can be told apart from one that is
+# busy on the database.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# [query count, db seconds, statements] of the request being served, the statements are
+# only recorded while QueryBudgetMiddleware sets a list there
+request_queries = ContextVar("request_queries", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = {}
+        self.queries = {}
+        self.db_time = {}
+        self.statuses = {}
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self, method, route, status, seconds, queries, db_seconds):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(queries)
+            self.db_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(db_seconds)
+            self.statuses[key + (status,)] = self.statuses.get(key + (status,), 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP udsm_http_requests_in_flight Requests being served")
+            lines.append("# TYPE udsm_http_requests_in_flight gauge")
+            lines.append(f"udsm_http_requests_in_flight {self.in_flight}")
+
+            lines.append("# HELP udsm_http_requests_total Requests served by route and status")
+            lines.append("# TYPE udsm_http_requests_total counter")
+            for (method, route, status), count in sorted(self.statuses.items()):
+                lines.append(f'udsm_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            for name, help, histograms in (
+                ("udsm_http_request_duration_seconds", "Request latency by route", self.latency),
+                ("udsm_db_queries_per_request", "Database queries run by one request", self.queries),
+                ("udsm_db_time_per_request_seconds", "Time one request spent in database queries", self.db_time),
+            ):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    lines.extend(histogram.lines(name, f'method="{method}",route="{route}"'))
+        return lines
+
+
+metrics = Metrics()
+
+
+def gauges(name, help, series):
+    # one gauge per value of each (labels, stats dict) pair, e.g. the pool or token cache report
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} gauge"
+    for labels, values in series:
+        for key, value in values.items():
+            yield f'{name}{{{labels},stat="{key}"}} {value}'
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = [0, 0.0, None]
+        token = request_queries.set(stats)
+        metrics.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_queries.reset(token)
+            # the route template, not the path, so ids don't make a series each
+            route = scope.get("route")
+            metrics.finish(scope["method"], route.path if route else "unmatched", status, time.perf_counter() - started, stats[0], stats[1])
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = request_queries.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+        if stats[2] is not None:
+            stats[2].append(statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
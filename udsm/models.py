@@ -1,6 +1,6 @@
 
 from typing import Optional
-from sqlalchemy import Column, Float, ForeignKey, Integer, String, DateTime, text, Enum, UniqueConstraint
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, LargeBinary, String, DateTime, func, text, Enum, UniqueConstraint
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.orm import relationship, validates
 
@@ -63,6 +63,8 @@ class Worker(Base):
     role = Column(String, nullable=False, default="user")
     unit = relationship('Unit', back_populates='workers')
     department = relationship('Department', back_populates='workers')
+
+    __table_args__ = (Index('ix_workers_category_unit_department', 'category', 'unit_id', 'department_id'),)
     
 class NominationPeriod(Base):
     __tablename__ = 'nomination_periods'
@@ -105,8 +107,53 @@ class Nomination(Base):
     department_id = Column(Integer, ForeignKey("departments.id"),  nullable=True)
     unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
 
+    __table_args__ = (
+        # also serves lookups by (nominator_id, category)
+        UniqueConstraint('nominator_id', 'category', 'nominee_id', name='_nomination_uc'),
+        Index('ix_nominations_nominee_id', 'nominee_id'),
+    )
+
     
 
+#categories a worker has committed nominations in, one commit per category
+class NominationSubmission(Base):
+    __tablename__ = "nomination_submissions"
+
+    nominator_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String, primary_key=True)
+    created_at= Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+
+#responses of vote and nomination submissions, replayed when a client retries with the same Idempotency-Key
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False)
+    route = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    # sha256 of the request body, NULL for keys stored before bodies were fingerprinted
+    fingerprint = Column(String, nullable=True)
+    # NULL while the first request with the key is still running
+    status_code = Column(Integer, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), index=True)
+
+    __table_args__ = (UniqueConstraint('user_id', 'route', 'key', name='_idempotency_key_uc'),)
+
+
+#nominations a worker has staged but not yet committed
+class StagedNomination(Base):
+    __tablename__ = "staged_nominations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False, index=True)
+    nominee_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False)
+    weight = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    staged_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), index=True)
+
+
 class Vote(Base):
     __tablename__ = "votes"
 
@@ -118,9 +165,71 @@ class Vote(Base):
     department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
     unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
 
+    __table_args__ = (
+        UniqueConstraint('voter_id', 'category', name='_vote_voter_category_uc'),
+        Index('ix_votes_category_unit_department', 'category', 'unit_id', 'department_id'),
+    )
+
 
     
 
+class VoteTally(Base):
+    __tablename__ = "vote_tallies"
+
+    id = Column(Integer, primary_key=True)
+    worker_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False)
+    votes = Column(Integer, nullable=False, server_default="0")
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
+    unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
+
+    __table_args__ = (UniqueConstraint('worker_id', 'category', name='_vote_tally_uc'),)
+
+
+class ResultSnapshot(Base):
+    __tablename__ = "result_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
+    unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
+    created_at= Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+class ResultSnapshotEntry(Base):
+    __tablename__ = "result_snapshot_entries"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("result_snapshots.id", ondelete="CASCADE"), nullable=False, index=True)
+    worker_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False)
+    percentage = Column(Float, server_default="0")
+
+#points readers at the latest complete snapshot of each (unit, department, category)
+class ResultSnapshotHead(Base):
+    __tablename__ = "result_snapshot_heads"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("result_snapshots.id"), nullable=False)
+    category = Column(String, nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
+    unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
+
+    # one head per key, department_id is NULL for institutes and schools and NULLs never
+    # clash in a plain unique constraint
+    __table_args__ = (Index('_result_snapshot_head_uc', unit_id, func.coalesce(department_id, 0), category, unique=True),)
+
+
+#candidates voters may choose from, the top nominees of each (unit, department, category)
+class BallotEntry(Base):
+    __tablename__ = "ballot_entries"
+
+    id = Column(Integer, primary_key=True)
+    worker_id = Column(Integer, ForeignKey("workers.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
+    unit_id = Column(Integer, ForeignKey('units.id'), nullable=False)
+
+
 class Result(Base):
     __tablename__ = "results"
 
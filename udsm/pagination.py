@@ -0,0 +1,46 @@
+import base64
+import binascii
+from typing import Optional
+from fastapi import HTTPException, Query, Response, status
+from .config import settings
+
+# Keyset pagination for list endpoints. Rows are ordered by a unique, increasing
+# column (the primary key) and each page starts after the last key of the previous
+# one, so a page costs the same however deep into the table it is. The token for the
+# next page is returned in the X-Next-Cursor header, the body stays a plain list.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_key: int) -> str:
+    return base64.urlsafe_b64encode(str(last_key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class Page:
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max)
+    ):
+        self.after = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+    def apply(self, query, column):
+        # works on both Query and select(), one extra row tells whether a next page exists
+        if self.after is not None:
+            query = query.filter(column > self.after)
+        return query.order_by(column).limit(self.limit + 1)
+
+    def finish(self, rows, response: Response, key=lambda row: row.id):
+        rows = list(rows)
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+        return rows
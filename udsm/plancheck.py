@@ -0,0 +1,66 @@
+import sys
+from sqlalchemy import func, select, text
+from udsm import models
+from udsm.database import engine
+
+# Checks that the hot voting and nomination queries are answered from their index.
+# Run after `alembic upgrade head` with: python -m udsm.plancheck
+#
+# Sequential scans are disabled for the check so small development tables still show
+# whether a usable index exists, the planner would otherwise prefer a scan on them.
+
+HOT_QUERIES = {
+    "votes by voter and category": (
+        "_vote_voter_category_uc",
+        select(models.Vote.id).where(models.Vote.voter_id == 1, models.Vote.category == "junior"),
+    ),
+    "votes by category, unit and department": (
+        "ix_votes_category_unit_department",
+        select(models.Vote.id).where(models.Vote.category == "junior", models.Vote.unit_id == 1, models.Vote.department_id == 1),
+    ),
+    "nominations by nominator and category": (
+        "_nomination_uc",
+        select(models.Nomination.id).where(models.Nomination.nominator_id == 1, models.Nomination.category == "junior"),
+    ),
+    "nomination points by nominee": (
+        "ix_nominations_nominee_id",
+        select(models.Nomination.nominee_id, func.sum(models.Nomination.weight)).group_by(models.Nomination.nominee_id),
+    ),
+    "workers by category, unit and department": (
+        "ix_workers_category_unit_department",
+        select(models.Worker.id).where(models.Worker.category == "junior", models.Worker.unit_id == 1, models.Worker.department_id == 1),
+    ),
+}
+
+
+def scans(plan):
+    # (node type, index) of every node reading a table
+    if "Relation Name" in plan:
+        yield plan["Node Type"], plan.get("Index Name")
+    for child in plan.get("Plans", []):
+        yield from scans(child)
+
+
+def check(connection):
+    failures = []
+    for name, (index, query) in HOT_QUERIES.items():
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+        used = list(scans(plan))
+        ok = any(used_index == index for _, used_index in used)
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: " + ", ".join(f"{node} using {used_index}" if used_index else node for node, used_index in used))
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def main():
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            failures = check(connection)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import threading
+import time
+from sqlalchemy import exc
+
+# Connection pool instrumentation. instrumented_pool() wraps a SQLAlchemy pool class
+# so every checkout is counted and timed, which tells pool exhaustion apart from
+# slow queries when requests pile up.
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def start_wait(self):
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def end_wait(self, started: float, outcome: str = "checkout"):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.waiting -= 1
+            if outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "checkout":
+                self.checkouts += 1
+                self.checkout_seconds_total += elapsed
+                self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+
+    def report(self, pool):
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_checkout_ms": round(self.checkout_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_checkout_ms": round(self.checkout_seconds_max * 1000, 3),
+            }
+
+
+def instrumented_pool(pool_class):
+    # a subclass per engine, pools rebuild themselves from their class on dispose()
+    stats = PoolStats()
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            started = stats.start_wait()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                stats.end_wait(started, "timeout")
+                raise
+            except BaseException:
+                stats.end_wait(started, "error")
+                raise
+            stats.end_wait(started)
+            return connection
+
+    InstrumentedPool.stats = stats
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
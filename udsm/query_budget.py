@@ -0,0 +1,71 @@
+import logging
+from .metrics import request_queries
+
+# Per-route query budgets. A route declares how many statements one request may run:
+#
+#     @router.get("/best_workers")
+#     @query_budget(2)
+#     async def get_best_workers(...):
+#
+# QueryBudgetMiddleware records the statements of every request and checks them against
+# the budget of the route it matched. With query_budget_mode "raise" an overrun raises
+# QueryBudgetExceeded, which fails the request under the test client, "log" logs it with
+# the statements for staging and "off" skips the middleware altogether. Budgets count
+# cold caches, so the period and ballot loads are included. The statements are collected
+# by the metrics cursor hook, `python -m benchmarks.loadtest --check-query-budgets` runs
+# every budgeted route in raise mode.
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, route: str, budget: int, statements: list):
+        self.route = route
+        self.budget = budget
+        self.statements = statements
+        listing = "\n".join(f"  {n}. {statement}" for n, statement in enumerate(statements, 1))
+        super().__init__(f"{route} ran {len(statements)} queries, its budget is {budget}:\n{listing}")
+
+
+def query_budget(budget: int):
+    def decorate(endpoint):
+        endpoint.query_budget = budget
+        return endpoint
+    return decorate
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app, mode: str):
+        if mode not in ("log", "raise"):
+            raise ValueError(f"Unknown query budget mode '{mode}', expected off, log or raise")
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = request_queries.get()
+        token = None
+        if stats is None:
+            # not behind MetricsMiddleware
+            stats = [0, 0.0, None]
+            token = request_queries.set(stats)
+        statements = stats[2] = []
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats[2] = None
+            if token is not None:
+                request_queries.reset(token)
+
+        route = scope.get("route")
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        if budget is None or len(statements) <= budget:
+            return
+        error = QueryBudgetExceeded(f"{scope['method']} {route.path}", budget, statements)
+        if self.mode == "raise":
+            raise error
+        logger.warning("Query budget exceeded: %s", error)
+
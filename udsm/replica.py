@@ -0,0 +1,90 @@
+import threading
+import time
+from sqlalchemy import text
+from .metrics import request_queries
+
+# Health of the read replica. Read-only routes use the replica only while it answers and
+# its replay lag is within max_lag_seconds, otherwise they fall back to the primary. The
+# check runs at most once per check_interval_seconds in one caller at a time, the others
+# go by the last result, and a dropped replica connection marks it down until the next
+# check. The check is not charged to the request that happens to run it.
+
+# seconds behind the primary, 0 when every received change is replayed or the server is
+# not a standby at all (e.g. a second database used as a stand-in locally)
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaHealth:
+    def __init__(self, max_lag_seconds: int, check_interval_seconds: int):
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._usable = False
+        self._lag = None
+        self._checked_at = None
+        self._probing = False
+        self.failed_checks = 0
+
+    def _start_probe(self):
+        # (probe now, last result), only one caller probes once the result is stale
+        with self._lock:
+            fresh = self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval_seconds
+            if fresh or self._probing:
+                return False, self._usable
+            self._probing = True
+            return True, self._usable
+
+    def _record(self, lag, probe=False):
+        with self._lock:
+            if probe:
+                self._probing = False
+            self._lag = lag
+            self._usable = lag is not None and lag <= self.max_lag_seconds
+            self._checked_at = time.monotonic()
+            if not self._usable:
+                self.failed_checks += 1
+            return self._usable
+
+    def usable(self, engine) -> bool:
+        probe, usable = self._start_probe()
+        if not probe:
+            return usable
+        lag = None
+        token = request_queries.set(None)
+        try:
+            with engine.connect() as connection:
+                lag = float(connection.execute(LAG_QUERY).scalar())
+        except Exception:
+            pass
+        finally:
+            request_queries.reset(token)
+            usable = self._record(lag, probe=True)
+        return usable
+
+    async def usable_async(self, async_engine) -> bool:
+        probe, usable = self._start_probe()
+        if not probe:
+            return usable
+        lag = None
+        token = request_queries.set(None)
+        try:
+            async with async_engine.connect() as connection:
+                lag = float((await connection.execute(LAG_QUERY)).scalar())
+        except Exception:
+            pass
+        finally:
+            request_queries.reset(token)
+            usable = self._record(lag, probe=True)
+        return usable
+
+    def mark_down(self):
+        self._record(None)
+
+    def report(self):
+        with self._lock:
+            return {"usable": int(self._usable), "lag_seconds": self._lag if self._lag is not None else -1, "failed_checks": self.failed_checks}
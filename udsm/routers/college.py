@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas
 from udsm.authentication import oauth2
-from ..database import get_db, engine
+from ..database import get_db, get_read_db, engine
+from ..hierarchy import hierarchy
 from ..unit import create_unit
 
 router=APIRouter(tags=['College'])
@@ -16,18 +17,19 @@ def create_college(college: schemas.CollegeCreate, db: Session = Depends(get_db)
     db.add(new_college)
     db.commit()
     create_unit(db,new_college)
+    hierarchy.invalidate()
     db.refresh(new_college)
     return new_college
 
 @router.get("/colleges/{college_id}")
-def retrieve_college(college_id: int, db: Session = Depends(get_db)):
+def retrieve_college(college_id: int, db: Session = Depends(get_read_db)):
     db_unit = db.query(models.College).filter(models.College.id == college_id).first()
     if db_unit is None:
         raise HTTPException(status_code=404, detail=f"Unit with id {college_id} not found")
     return db_unit
 
 @router.get("/colleges/")
-def retrieve_all_colleges(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def retrieve_all_colleges(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
     colleges=db.query(models.College).offset(skip).limit(limit).all()
     if colleges is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No unit found")
@@ -41,6 +43,7 @@ def update_college(college_id: int, unit: schemas.UnitCreate, db: Session = Depe
     for key, value in unit.model_dump().items():
         setattr(college, key, value)
     db.commit()
+    hierarchy.invalidate()
     db.refresh(college)
     return college
 
@@ -51,4 +54,5 @@ def delete_college(college_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Unit not found")
     db.delete(college)
     db.commit()
+    hierarchy.invalidate()
     return {"message": "Unit deleted successfully"}
@@ -0,0 +1,129 @@
+import csv
+import io
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from .. import models, schemas
+from ..authentication import oauth2
+from ..database import read_session
+from .schedule import is_admin
+
+router = APIRouter(tags=['Export'])
+
+# Ledger exports for auditors. Rows are read from a server-side cursor in chunks and
+# encoded as they arrive, so memory stays flat however large the ledger is.
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_BUFFER_BYTES = 64 * 1024
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def encode_rows(rows, columns, format):
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= EXPORT_BUFFER_BYTES:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+    else:
+        chunk = bytearray()
+        for row in rows:
+            chunk += orjson.dumps(dict(zip(columns, row)))
+            chunk += b"\n"
+            if len(chunk) >= EXPORT_BUFFER_BYTES:
+                yield bytes(chunk)
+                chunk.clear()
+        yield bytes(chunk)
+
+
+def stream_export(build_query, columns, format, filename):
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format '{format}', use ndjson or csv")
+
+    def generate():
+        # the request's session is closed before streaming starts, so the export owns its own
+        db = read_session()
+        try:
+            yield from encode_rows(build_query(db).yield_per(EXPORT_CHUNK_SIZE), columns, format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+
+def apply_filters(query, model, unit_id, department_id, category):
+    if unit_id is not None:
+        query = query.filter(model.unit_id == unit_id)
+    if department_id is not None:
+        query = query.filter(model.department_id == department_id)
+    if category is not None:
+        query = query.filter(model.category == category)
+    return query
+
+
+@router.get("/export/votes")
+def export_votes(format: str = "ndjson", unit_id: Optional[int] = None, department_id: Optional[int] = None, category: Optional[str] = None, current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+    columns = ["id", "voter_id", "votee_id", "category", "unit_id", "department_id", "created_at"]
+
+    def build_query(db):
+        query = db.query(*(getattr(models.Vote, column) for column in columns))
+        return apply_filters(query, models.Vote, unit_id, department_id, category).order_by(models.Vote.id)
+
+    return stream_export(build_query, columns, format, "votes")
+
+
+@router.get("/export/nominations")
+def export_nominations(format: str = "ndjson", unit_id: Optional[int] = None, department_id: Optional[int] = None, category: Optional[str] = None, current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+    columns = ["id", "nominator_id", "nominee_id", "weight", "category", "unit_id", "department_id", "created_at"]
+
+    def build_query(db):
+        query = db.query(*(getattr(models.Nomination, column) for column in columns))
+        return apply_filters(query, models.Nomination, unit_id, department_id, category).order_by(models.Nomination.id)
+
+    return stream_export(build_query, columns, format, "nominations")
+
+
+@router.get("/export/nomination-results")
+def export_nomination_results(format: str = "ndjson", unit_id: Optional[int] = None, department_id: Optional[int] = None, category: Optional[str] = None, current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+    columns = ["unit_id", "department_id", "category", "version", "worker_id", "percentage"]
+
+    def build_query(db):
+        # entries of the currently published snapshot of every (unit, department, category)
+        query = db.query(
+            models.ResultSnapshotHead.unit_id,
+            models.ResultSnapshotHead.department_id,
+            models.ResultSnapshotHead.category,
+            models.ResultSnapshot.version,
+            models.ResultSnapshotEntry.worker_id,
+            models.ResultSnapshotEntry.percentage
+        ).join(models.ResultSnapshot, models.ResultSnapshot.id == models.ResultSnapshotHead.snapshot_id)\
+         .join(models.ResultSnapshotEntry, models.ResultSnapshotEntry.snapshot_id == models.ResultSnapshotHead.snapshot_id)
+        query = apply_filters(query, models.ResultSnapshotHead, unit_id, department_id, category)
+        return query.order_by(models.ResultSnapshotHead.id, models.ResultSnapshotEntry.percentage.desc())
+
+    return stream_export(build_query, columns, format, "nomination_results")
+
+
+@router.get("/export/vote-results")
+def export_vote_results(format: str = "ndjson", unit_id: Optional[int] = None, department_id: Optional[int] = None, category: Optional[str] = None, current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+    columns = ["unit_id", "department_id", "category", "worker_id", "votes"]
+
+    def build_query(db):
+        query = db.query(*(getattr(models.VoteTally, column) for column in columns))
+        return apply_filters(query, models.VoteTally, unit_id, department_id, category).order_by(models.VoteTally.id)
+
+    return stream_export(build_query, columns, format, "vote_results")
@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas
 from udsm.authentication import oauth2
-from ..database import get_db, engine
+from ..database import get_db, get_read_db, engine
+from ..hierarchy import hierarchy
 from ..unit import create_unit
 
 router=APIRouter(tags=['Institute'])
@@ -16,18 +17,19 @@ def create_inst(inst: schemas.CollegeCreate, db: Session = Depends(get_db)):
     db.add(new_inst)
     db.commit()
     create_unit(db,new_inst)
+    hierarchy.invalidate()
     db.refresh(new_inst)
     return new_inst
 
 @router.get("/institutes/{inst_id}")
-def retrieve_inst(inst_id: int, db: Session = Depends(get_db)):
+def retrieve_inst(inst_id: int, db: Session = Depends(get_read_db)):
     inst = db.query(models.Institute).filter(models.Institute.id == inst_id).first()
     if inst is None:
         raise HTTPException(status_code=404, detail=f"Unit with id {inst_id} not found")
     return inst
 
 @router.get("/institutes/")
-def retrieve_insts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def retrieve_insts(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
     insts=db.query(models.Institute).offset(skip).limit(limit).all()
     if insts is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No unit found")
@@ -41,6 +43,7 @@ def update_inst(inst_id: int, unit: schemas.UnitCreate, db: Session = Depends(ge
     for key, value in unit.model_dump().items():
         setattr(inst, key, value)
     db.commit()
+    hierarchy.invalidate()
     db.refresh(inst)
     return inst
 
@@ -51,4 +54,5 @@ def delete_inst(inst_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Unit not found")
     db.delete(inst)
     db.commit()
+    hierarchy.invalidate()
     return {"message": "Unit deleted successfully"}
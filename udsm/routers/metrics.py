@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..admission import login_concurrency, vote_concurrency
+from ..authentication.oauth2 import token_cache
+from ..database import pool_report, replica_engine, replica_health
+from ..metrics import gauges, metrics
+
+router = APIRouter(tags=['Metrics'])
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    lines = metrics.render()
+    lines.extend(gauges("udsm_db_pool", "Connection pool state and checkout waits",
+                        [(f'engine="{engine_name}"', report) for engine_name, report in pool_report().items()]))
+    if replica_engine:
+        lines.extend(gauges("udsm_db_replica", "Read replica health and replay lag", [('replica="read"', replica_health.report())]))
+    lines.extend(gauges("udsm_token_cache", "Decoded token cache", [('cache="token"', token_cache.stats())]))
+    lines.extend(gauges("udsm_admission", "Requests running and shed per route class",
+                        [(f'route_class="{limit.name}"', limit.stats()) for limit in (login_concurrency, vote_concurrency)]))
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -1,41 +1,54 @@
 
-from fastapi import APIRouter, FastAPI, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Response, status
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from .. import models, schemas, dependencies
-from sqlalchemy import func
+from typing import List, Dict, Union
+from .. import models, schemas, dependencies, snapshots, staging
+from ..config import settings
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
 from udsm.authentication import oauth2
-from ..database import get_db
+from ..database import get_db, get_async_db, get_async_read_db
+from ..hierarchy import hierarchy
+from ..pagination import Page
+from ..query_budget import query_budget
 
 router = APIRouter(tags=['Nominations'])
 
+# list routes read these columns as rows instead of hydrating ORM objects
+NOMINATION_COLUMNS = (
+    models.Nomination.id, models.Nomination.nominator_id, models.Nomination.nominee_id, models.Nomination.weight,
+    models.Nomination.category, models.Nomination.department_id, models.Nomination.unit_id, models.Nomination.created_at
+)
 
-class NominationsStaging:
-    def __init__(self):
-        self.user_nominations: Dict[str, List[schemas.Nomination]] = {}
 
-    def stage_nomination(self, user_id: str, nomination: schemas.Nomination):
-        if user_id not in self.user_nominations:
-            self.user_nominations[user_id] = []
+class NominationsStaging:
+    def __init__(self, backend):
+        self.backend = backend
 
+    def stage_nomination(self, db: Session, user_id: int, nomination: schemas.Nomination):
         # Count nominations for the same category
-        category_count = sum(1 for nom in self.user_nominations[user_id] if nom.category == nomination.category)
+        category_count = sum(1 for category, _, _ in self.backend.load(db, user_id) if category == nomination.category)
 
         if category_count < 3:
-            self.user_nominations[user_id].append(nomination)
+            self.backend.add(db, user_id, (nomination.category, nomination.nominee_id, nomination.weight))
         else:
             raise HTTPException(status_code=400, detail="You can only stage three nominations per category")
 
-    def get_staged_nominations(self, user_id: str) -> List[schemas.Nomination]:
-        return self.user_nominations.get(user_id, [])
+    def get_staged_nominations(self, db: Session, user_id: int) -> List[schemas.Nomination]:
+        return [
+            schemas.Nomination(category=category, nominee_id=nominee_id, weight=weight)
+            for category, nominee_id, weight in self.backend.load(db, user_id)
+        ]
 
-    def clear_staged_nominations(self, user_id: str):
-        if user_id in self.user_nominations:
-            self.user_nominations[user_id] = []
+    def clear_staged_nominations(self, db: Session, user_id: int):
+        self.backend.clear(db, user_id)
 
 # Create an instance of the staging class
-nominations_staging = NominationsStaging()
+nominations_staging = NominationsStaging(
+    staging.create_backend(settings.nomination_staging_backend, settings.nomination_staging_ttl_seconds)
+)
 
 
 def ensure_three_nominations(db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
@@ -46,93 +59,114 @@ def ensure_three_nominations(db: Session = Depends(get_db), current_user = Depen
         raise HTTPException(status_code=400, detail="You must create exactly three nominations")
 
 
+async def release_category(db: AsyncSession, nominator_id: int, category: str):
+    # a category left without nominations may be committed again
+    await db.execute(delete(models.NominationSubmission).filter(
+        models.NominationSubmission.nominator_id == nominator_id,
+        models.NominationSubmission.category == category,
+        ~select(models.Nomination.id).filter(models.Nomination.nominator_id == nominator_id, models.Nomination.category == category).exists()
+    ).execution_options(synchronize_session=False))
+
+
 @router.post("/nominations/", response_model=schemas.Nomination)
-def create_nomination(
+@query_budget(13)
+async def create_nomination(
     nomination: schemas.Nomination,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)
 ):
-    dependencies.check_nomination_period(db=db)
-    unit = db.query(models.Unit).filter(models.Unit.unit_id == current_user['unit_id']).first()
+    await db.run_sync(dependencies.check_nomination_period)
+    unit = await db.run_sync(hierarchy.unit, current_user['unit_id'])
     if not unit:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unit with id {current_user['unit_id']} does not exist")
 
     if unit.unit_type == "COLLEGE":
-        department = db.query(models.Department).filter(
-            models.Department.id == current_user['department_id'],
-            models.Department.college_id == current_user['unit_id']
-        ).first()
+        department = await db.run_sync(hierarchy.department, current_user['department_id'])
 
-        if not department:
+        if not department or department.college_id != current_user['unit_id']:
             raise HTTPException(status_code=404, detail="Department not found")
 
-        if not db.query(models.Worker).filter(models.Worker.id == nomination.nominee_id, models.Worker.department_id == department.id).first():
+        if not (await db.execute(select(models.Worker).filter(models.Worker.id == nomination.nominee_id, models.Worker.department_id == department.id))).scalars().first():
             raise HTTPException(status_code=400, detail="Staff does not belong to the same department")
 
-    nominee = db.query(models.Worker).filter_by(id=nomination.nominee_id, unit_id=current_user['unit_id']).first()
+    nominee = (await db.execute(select(models.Worker).filter_by(id=nomination.nominee_id, unit_id=current_user['unit_id']))).scalars().first()
     if not nominee:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nominee does not exist in this unit")
 
     if nominee.category != nomination.category:
         raise HTTPException(status_code=400, detail=f"Nominee is not of {nomination.category} category")
 
-    for staged_nomination in nominations_staging.get_staged_nominations(current_user['id']):
+    for staged_nomination in await db.run_sync(nominations_staging.get_staged_nominations, current_user['id']):
         if staged_nomination.nominee_id == nomination.nominee_id:
             raise HTTPException(status_code=400, detail="You have already nominated this candidate")
         if staged_nomination.weight == nomination.weight and staged_nomination.category==nomination.category:
             raise HTTPException(status_code=400, detail="You can't nominate two candidates with the same weight")
 
-    nominations_staging.stage_nomination(current_user['id'], nomination)
+    await db.run_sync(nominations_staging.stage_nomination, current_user['id'], nomination)
     return nomination
 
 
 @router.post("/commit-nominations/", response_model=List[schemas.Nomination])
-def commit_nominations(
-    db: Session = Depends(get_db), 
+@query_budget(8)
+async def commit_nominations(
+    db: AsyncSession = Depends(get_async_db), 
     current_user: schemas.CurrentUser = Depends(oauth2.get_current_user)
 ):
-    dependencies.check_nomination_period(db=db)
-    staged_nominations = nominations_staging.get_staged_nominations(current_user['id'])
-    
-    # Check if the user already has nominations in any of the categories they are trying to nominate
-    for staged_nomination in staged_nominations:
-        nom_exists = db.query(models.Nomination).filter(
-            models.Nomination.nominator_id == current_user['id'],
-            models.Nomination.category == staged_nomination.category
-        ).first()
-        if nom_exists:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT, 
-                detail=f"You have already nominated in the {staged_nomination.category} category"
-            )
-        nominations_staging.clear_staged_nominations(current_user['id'])
-
+    await db.run_sync(dependencies.check_nomination_period)
+    staged_nominations = await db.run_sync(nominations_staging.get_staged_nominations, current_user['id'])
     if len(staged_nominations) != 3:
         raise HTTPException(status_code=400, detail="You must stage exactly three nominations")
 
+    # A nominator commits once per category. The submission rows' primary key refuses a
+    # category that is already committed, by an earlier commit or a concurrent one
+    categories = list(dict.fromkeys(nomination.category for nomination in staged_nominations))
+    submit = insert(models.NominationSubmission).values([
+        {"nominator_id": current_user['id'], "category": category} for category in categories
+    ]).on_conflict_do_nothing().returning(models.NominationSubmission.category)
+    stmt = insert(models.Nomination).values([
+        {
+            "nominator_id": current_user['id'],
+            "nominee_id": nomination.nominee_id,
+            "weight": nomination.weight,
+            "category": nomination.category,
+            "department_id": current_user['department_id'],
+            "unit_id": current_user['unit_id'],
+        }
+        for nomination in staged_nominations
+    ]).on_conflict_do_nothing(constraint='_nomination_uc').returning(models.Nomination.category)
+
+    conflict = None
     try:
-        for nomination in staged_nominations:
-            db_nomination = models.Nomination(
-                **nomination.model_dump(), 
-                department_id=current_user['department_id'], 
-                nominator_id=current_user['id'],
-                unit_id=current_user['unit_id']
+        savepoint = await db.begin_nested()
+        submitted = [category for category, in await db.execute(submit)]
+        inserted = [category for category, in await db.execute(stmt)] if len(submitted) == len(categories) else []
+        if len(inserted) == len(staged_nominations):
+            await savepoint.commit()
+        else:
+            await savepoint.rollback()
+            category = next((category for category in categories if category not in submitted), categories[0])
+            conflict = HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"You have already nominated in the {category} category"
             )
-            db.add(db_nomination)
-        
-        db.commit()
+        # the staged set is used up either way, a refused one would only fail again
+        await db.run_sync(nominations_staging.clear_staged_nominations, current_user['id'])
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="An error occurred while committing nominations")
-    nominations_staging.clear_staged_nominations(current_user['id'])
-    my_noms = db.query(models.Nomination).filter(models.Nomination.nominator_id == current_user['id']).all()
+    if conflict:
+        raise conflict
+    my_noms = (await db.execute(select(models.Nomination).filter(models.Nomination.nominator_id == current_user['id']))).scalars().all()
     return my_noms
 
 
 #getting all available nominations in a unit
-@router.get("/nominations/by-unit/{unit_id}/by-category/{category}")
-def all_nominations(unit_id:int, category:str, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    nominations = db.query(models.Nomination).filter(models.Nomination.unit_id==unit_id,models.Nomination.category==category).all()
+@router.get("/nominations/by-unit/{unit_id}/by-category/{category}", response_model=List[schemas.NominationOut])
+@query_budget(1)
+async def all_nominations(unit_id:int, category:str, response: Response, page: Page = Depends(), db: AsyncSession = Depends(get_async_read_db), current_user = Depends(oauth2.get_current_user)):
+    query = select(*NOMINATION_COLUMNS).filter(models.Nomination.unit_id==unit_id,models.Nomination.category==category)
+    nominations = page.finish((await db.execute(page.apply(query, models.Nomination.id))).all(), response)
     if not nominations:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No nominations found")
     return nominations
@@ -140,9 +174,9 @@ def all_nominations(unit_id:int, category:str, db: Session = Depends(get_db), cu
 
 
 #getting all nominations of a worker by using their id
-@router.get("/nominations/{nominator_id}")
-def my_nominations(nominator_id: int, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    nominations = db.query(models.Nomination).filter_by(nominator_id=nominator_id).all()
+@router.get("/nominations/{nominator_id}", response_model=List[schemas.NominationOut])
+async def my_nominations(nominator_id: int, db: AsyncSession = Depends(get_async_db), current_user = Depends(oauth2.get_current_user)):
+    nominations = (await db.execute(select(*NOMINATION_COLUMNS).filter_by(nominator_id=nominator_id))).all()
     if not nominations:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No nominations found for this user")
     return nominations
@@ -150,8 +184,8 @@ def my_nominations(nominator_id: int, db: Session = Depends(get_db), current_use
 
 #getting a single nomination of a worker using their id and nomination id
 @router.get("/nominations/{nomination_id}")
-def my_nomination(nomination_id: int, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    nomination = db.query(models.Nomination).filter_by(nominator_id=current_user['id'], id=nomination_id).first()
+async def my_nomination(nomination_id: int, db: AsyncSession = Depends(get_async_db), current_user = Depends(oauth2.get_current_user)):
+    nomination = (await db.execute(select(models.Nomination).filter_by(nominator_id=current_user['id'], id=nomination_id))).scalars().first()
     if not nomination:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nomination not found")
     return nomination
@@ -160,8 +194,8 @@ def my_nomination(nomination_id: int, db: Session = Depends(get_db), current_use
 
 
 @router.delete("/nominations/{id}")
-def delete_nomination(id: int, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    nomination = db.query(models.Nomination).filter(models.Nomination.id == id).first()
+async def delete_nomination(id: int, db: AsyncSession = Depends(get_async_db), current_user = Depends(oauth2.get_current_user)):
+    nomination = (await db.execute(select(models.Nomination).filter(models.Nomination.id == id))).scalars().first()
        
     if not nomination:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Nomination with id {id} does not exist")
@@ -169,202 +203,96 @@ def delete_nomination(id: int, db: Session = Depends(get_db), current_user = Dep
     if nomination.nominator_id != current_user['id']:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action")
         
-    db.delete(nomination)
-    db.commit()
+    await db.delete(nomination)
+    await db.flush()
+    await release_category(db, nomination.nominator_id, nomination.category)
+    await db.commit()
     return {"detail": f"Nomination with id {id} was successfully deleted"}
 
 
 @router.put("/nominations/{id}", response_model=schemas.Nomination)
-def update_nomination(id: int, post: schemas.Nomination, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    nomination = db.query(models.Nomination).filter(models.Nomination.id == id).first()
+async def update_nomination(id: int, post: schemas.Nomination, db: AsyncSession = Depends(get_async_db), current_user = Depends(oauth2.get_current_user)):
+    nomination = (await db.execute(select(models.Nomination).filter(models.Nomination.id == id))).scalars().first()
     if not nomination:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Nomination with id {id} does not exist")
     
     if nomination.nominator_id != current_user['id']:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action")
          
+    category = nomination.category
     for key, value in post.model_dump().items():
         setattr(nomination, key, value)
-    db.commit()
+    if nomination.category != category:
+        await db.flush()
+        await release_category(db, nomination.nominator_id, category)
+        await db.execute(insert(models.NominationSubmission).values(nominator_id=nomination.nominator_id, category=nomination.category).on_conflict_do_nothing())
+    await db.commit()
     return nomination
 
 
-@router.get("/nom_results/{category}")
-def compute_results(category: str, db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    dependencies.check_nom_result_release_period(db=db)
-    try:
-        # Delete results only for the specified category and user's unit and department
-        db.query(models.Result).filter(models.Result.worker_id.in_(
-            db.query(models.Worker.id)
-            .filter(
-                models.Worker.category == category,
-                models.Worker.department_id == current_user['department_id'],
-                models.Worker.unit_id == current_user['unit_id']
-            )
-        )).delete(synchronize_session=False)
-        db.commit()
-    except OperationalError:
-        pass
+@router.get("/nom_results/{category}", response_model=List[schemas.NominationResultOut])
+@query_budget(6)
+async def compute_results(category: str, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(oauth2.get_current_user)):
+    await db.run_sync(dependencies.check_nom_result_release_period)
 
-    unit = db.query(models.Unit).filter(models.Unit.unit_id == current_user['unit_id']).first()
+    unit = await db.run_sync(hierarchy.unit, current_user['unit_id'])
     if not unit:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unit with id {current_user['unit_id']} does not exist")
 
-    # Count total distinct workers who have created nominations in the specified category
-    total_workers = db.query(models.Nomination)\
-                      .join(models.Worker, models.Nomination.nominator_id == models.Worker.id)\
-                      .filter(
-                          models.Nomination.category == category,
-                          models.Worker.department_id == current_user['department_id'],
-                          models.Worker.unit_id == current_user['unit_id']
-                      )\
-                      .distinct(models.Nomination.nominator_id)\
-                      .count()
-
-    if total_workers == 0:
+    # Read the top three of the latest published snapshot
+    results = await db.run_sync(snapshots.latest, current_user['unit_id'], current_user['department_id'], category, limit=3)
+    if not results:
         raise HTTPException(status_code=400, detail="No nominations found for the specified category")
 
-    overall_total_points = 6 * total_workers
-
-    # Calculate results for each worker in the specified category
-    worker_results = db.query(models.Nomination.nominee_id, func.sum(models.Nomination.weight).label('total_points'))\
-                       .join(models.Worker, models.Nomination.nominee_id == models.Worker.id)\
-                       .filter(
-                           models.Worker.category == category,
-                           models.Worker.department_id == current_user['department_id'],
-                           models.Worker.unit_id == current_user['unit_id']
-                       )\
-                       .group_by(models.Nomination.nominee_id)\
-                       .all()
-
-    for worker_id, worker_total_points in worker_results:
-        percentage = round((worker_total_points / overall_total_points) * 100, 2) if overall_total_points != 0 else 0
-        db_result = models.Result(worker_id=worker_id, percentage=percentage)
-        db.add(db_result)
-
-    db.commit()
-
-    # Retrieve results along with worker information for the specified category
-    results = db.query(models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .join(models.Worker, models.Result.worker_id == models.Worker.id, isouter=True)\
-                .filter(
-                    models.Worker.category == category,
-                    models.Worker.department_id == current_user['department_id'],
-                    models.Worker.unit_id == current_user['unit_id']
-                )\
-                .group_by(models.Result.id, models.Result.worker_id,models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .order_by(models.Result.percentage.desc()).limit(3)\
-                .all()
-
     formatted_results = [
         {
             "id":id,
             "name": name,
             "category": worker_category,
             "email": email,
-            "percentage": result.percentage,
+            "percentage": percentage,
         }
-        for result,id, email, worker_category, name in results
+        for percentage, worker_category, id, email, name in results
     ]
 
     return formatted_results
 
 
 
-@router.get("/nomination_results/all")
-def get_all_results(db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    dependencies.check_nom_result_release_period(db=db)
+@router.get("/nomination_results/all", response_model=List[Union[schemas.NominationResultOut, schemas.CategoryMessage]])
+@query_budget(6)
+async def get_all_results(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(oauth2.get_current_user)):
+    await db.run_sync(dependencies.check_nom_result_release_period)
     categories = ["junior", "senior", "administrative"]
     all_results = []
 
-    for category in categories:
-        try:
-            # Delete results only for the specified category and user's unit and department
-            db.query(models.Result).filter(models.Result.worker_id.in_(
-                db.query(models.Worker.id)
-                .filter(
-                    models.Worker.category == category,
-                    models.Worker.department_id == current_user['department_id'],
-                    models.Worker.unit_id == current_user['unit_id']
-                )
-            )).delete(synchronize_session=False)
-            db.commit()
-        except OperationalError:
-            pass
-
-        unit = db.query(models.Unit).filter(models.Unit.unit_id == current_user['unit_id']).first()
-        if not unit:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unit with id {current_user['unit_id']} does not exist")
-
-        # Count total distinct workers who have created nominations in the specified category
-        total_workers = db.query(models.Nomination)\
-                          .join(models.Worker, models.Nomination.nominator_id == models.Worker.id)\
-                          .filter(
-                              models.Nomination.category == category,
-                              models.Worker.department_id == current_user['department_id'],
-                              models.Worker.unit_id == current_user['unit_id']
-                          )\
-                          .distinct(models.Nomination.nominator_id)\
-                          .count()
-
-        print(f"Total workers for category '{category}': {total_workers}")  # Logging
-
-        if total_workers == 0:
-            all_results.append({
-                "category": category,
-                "message": f"Nomination results for the {category} category are not ready."
-            })
-            continue
+    unit = await db.run_sync(hierarchy.unit, current_user['unit_id'])
+    if not unit:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unit with id {current_user['unit_id']} does not exist")
 
-        overall_total_points = 6 * total_workers
-
-        # Calculate results for each worker in the specified category
-        worker_results = db.query(models.Nomination.nominee_id, func.sum(models.Nomination.weight).label('total_points'))\
-                           .join(models.Worker, models.Nomination.nominee_id == models.Worker.id)\
-                           .filter(
-                               models.Worker.category == category,
-                               models.Worker.department_id == current_user['department_id'],
-                               models.Worker.unit_id == current_user['unit_id']
-                           )\
-                           .group_by(models.Nomination.nominee_id)\
-                           .all()
-
-        for worker_id, worker_total_points in worker_results:
-            percentage = round((worker_total_points / overall_total_points) * 100, 2) if overall_total_points != 0 else 0
-            db_result = models.Result(worker_id=worker_id, percentage=percentage)
-            db.add(db_result)
-
-        db.commit()
-
-        # Retrieve results along with worker information for the specified category
-        results = db.query(models.Result, models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                    .join(models.Worker, models.Result.worker_id == models.Worker.id, isouter=True)\
-                    .filter(
-                        models.Worker.category == category,
-                        models.Worker.department_id == current_user['department_id'],
-                        models.Worker.unit_id == current_user['unit_id']
-                    )\
-                    .group_by(models.Result.id, models.Result.worker_id, models.Result, models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                    .order_by(models.Result.percentage.desc()).limit(3)\
-                    .all()
+    # One read of the latest snapshots for every category, already ordered best first
+    results = await db.run_sync(snapshots.latest, current_user['unit_id'], current_user['department_id'])
 
+    for category in categories:
         formatted_results = [
             {
                 "id": id,
                 "name": name,
                 "category": worker_category,
                 "email": email,
-                "percentage": result.percentage,
+                "percentage": percentage,
             }
-            for result, id, email, worker_category, name in results
-        ]
+            for percentage, worker_category, id, email, name in results
+            if worker_category == category
+        ][:3]
 
-        print(f"Formatted results for category '{category}': {formatted_results}")  # Logging
+        if not formatted_results:
+            all_results.append({
+                "category": category,
+                "message": f"Nomination results for the {category} category are not ready."
+            })
+            continue
 
         all_results.extend(formatted_results)
 
     return all_results
-
-
-
-
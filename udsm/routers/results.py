@@ -1,55 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import OperationalError
 from sqlalchemy import func
 from .. import models
-from .. import schemas, dependencies
-from ..database import get_db
+from .. import schemas, dependencies, tally
+from ..database import get_async_read_db
 from ..authentication import oauth2
+from ..query_budget import query_budget
+from ..leaderboard import leaderboard
+from .schedule import is_admin
 
 router = APIRouter(tags=['Results'])
 
-@router.get("/best_workers")
-def get_best_workers(db: Session = Depends(get_db), current_user = Depends(oauth2.get_current_user)):
+@router.get("/best_workers", response_model=List[schemas.BestWorkerOut])
+@query_budget(2)
+async def get_best_workers(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(oauth2.get_current_user)):
     unit_id = current_user['unit_id']
     categories = ['junior', 'senior', 'administrative']
 
     best_workers = []
+    winners = await db.run_sync(tally.unit_winners, unit_id)
 
     for category in categories:
-        # Retrieve all workers in the specified category and unit
-        workers_in_category = db.query(models.Worker.id, models.Worker.name, models.Worker.email, models.Worker.category)\
-                                .filter(models.Worker.category == category, models.Worker.unit_id == unit_id).all()
-
-        if not workers_in_category:
-            continue
-
-        # Retrieve all results in the specified category and unit
-        results_in_category = db.query(models.VoteResult.worker_id, models.VoteResult.percentage)\
-                                .join(models.Worker, models.VoteResult.worker_id == models.Worker.id)\
-                                .filter(models.Worker.category == category, models.Worker.unit_id == unit_id).all()
-
-        if not results_in_category:
-            continue
-
         # Find the worker with the highest win percentage
-        best_worker = max(results_in_category, key=lambda x: x.percentage)
-
-        worker_details = db.query(models.Worker.name, models.Worker.email)\
-                           .filter(models.Worker.id == best_worker.worker_id).first()
-
-        if not worker_details:
+        best_worker = winners.get(category)
+        if not best_worker:
             continue
 
         best_workers.append({
             
-            "name": worker_details.name,
-            "email": worker_details.email,
+            "name": best_worker["name"],
+            "email": best_worker["email"],
             "category": category,
-            "percentage": best_worker.percentage,
+            "percentage": best_worker["percentage"],
         })
 
     if not best_workers:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No workers found for any category")
 
-    return best_workers
\ No newline at end of file
+    return best_workers
+
+
+# Admin report of the leading workers of every unit, department and category
+# cached for LEADERBOARD_CACHE_TTL_SECONDS, new votes show up after that or a /rebuild-vote-tally
+@router.get("/leaderboard", response_model=List[schemas.LeaderboardEntry])
+@query_budget(1)
+async def get_leaderboard(top: int = Query(1, ge=1, le=10), db: AsyncSession = Depends(get_async_read_db), current_user = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+    return await db.run_sync(leaderboard.get, top)
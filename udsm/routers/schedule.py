@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-from udsm import models, schemas
-from udsm.database import get_db
+from udsm import models, schemas, ballot, snapshots, tally
+from udsm.dependencies import period_registry
+from udsm.leaderboard import leaderboard
+from udsm.database import get_db, pool_report
+from udsm.pagination import Page
 from typing import List
 import pytz
-from udsm.authentication.oauth2 import get_current_user
+from udsm.authentication.oauth2 import get_current_user, token_cache
 
 router = APIRouter(tags=['Admin Endpoints'])
 
@@ -26,6 +29,7 @@ def create_nomination_period(period: schemas.NominationPeriodBase, db: Session =
     )
     db.add(db_period)
     db.commit()
+    period_registry.invalidate()
     db.refresh(db_period)
     return schemas.NominationPeriodOut(
         id=db_period.id,
@@ -36,10 +40,10 @@ def create_nomination_period(period: schemas.NominationPeriodBase, db: Session =
 
 
 @router.get("/schedule-nomination", response_model=List[schemas.NominationPeriodOut])
-def get_nomination_period(db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+def get_nomination_period(response: Response, page: Page = Depends(), db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
     is_admin(current_user=current_user)
 
-    db_period = db.query(models.NominationPeriod).all()
+    db_period = page.finish(page.apply(db.query(models.NominationPeriod), models.NominationPeriod.id).all(), response)
     if not db_period:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No nomination schedules yet")
     return db_period
@@ -53,12 +57,17 @@ def schedule_voting(period: schemas.VotingPeriodCreate, db: Session = Depends(ge
     start_time = datetime.strptime(period.start_time, "%Y-%m-%d %H:%M:%S")
     end_time = datetime.strptime(period.end_time, "%Y-%m-%d %H:%M:%S")
 
+    # Voting opens on the current nomination results, published and on the ballot before
+    # the period is
+    snapshots.publish_nomination_results(db)
+    ballot.build(db)
     db_period = models.VotingPeriod(
         start_time=start_time,
         end_time=end_time
     )
     db.add(db_period)
     db.commit()
+    period_registry.invalidate()
     db.refresh(db_period)
     return schemas.VotingPeriodOut(
         id=db_period.id,
@@ -73,11 +82,14 @@ def schedule_result_release(period: schemas.ResultReleasePeriodCreate, db: Sessi
     # Parse the provided datetime strings and convert to UTC
     release_time = datetime.strptime(period.release_time, "%Y-%m-%d %H:%M:%S")
 
+    # Released results are the published snapshots, publish what the nominations say now
+    snapshots.publish_nomination_results(db)
     db_period = models.NominationResultReleasePeriod(
         release_time=release_time
     )
     db.add(db_period)
     db.commit()
+    period_registry.invalidate()
     db.refresh(db_period)
     return schemas.ResultReleasePeriodOut(
         id=db_period.id,
@@ -96,8 +108,37 @@ def schedule_result_release(period: schemas.ResultReleasePeriodCreate, db: Sessi
     )
     db.add(db_period)
     db.commit()
+    period_registry.invalidate()
     db.refresh(db_period)
     return schemas.ResultReleasePeriodOut(
         id=db_period.id,
         release_time=db_period.release_time.isoformat(),
     )
+
+
+@router.post("/rebuild-vote-tally")
+def rebuild_vote_tally(db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    is_admin(current_user=current_user)
+    candidates = tally.rebuild(db)
+    leaderboard.invalidate()
+    return {"detail": f"Vote tally rebuilt for {candidates} candidates"}
+
+
+@router.post("/publish-nomination-results")
+def publish_nomination_results(db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(get_current_user)):
+    is_admin(current_user=current_user)
+    published = snapshots.publish_nomination_results(db)
+    ballot.build(db)
+    return {"detail": f"Published nomination results for {published} categories"}
+
+
+@router.get("/db-pool")
+def get_db_pool(current_user: schemas.CurrentUser = Depends(get_current_user)):
+    is_admin(current_user=current_user)
+    return pool_report()
+
+
+@router.get("/token-cache")
+def get_token_cache(current_user: schemas.CurrentUser = Depends(get_current_user)):
+    is_admin(current_user=current_user)
+    return token_cache.stats()
@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas
 from udsm.authentication import oauth2
-from ..database import get_db, engine
+from ..database import get_db, get_read_db, engine
+from ..hierarchy import hierarchy
 from ..unit import create_unit
 
 router=APIRouter(tags=['School'])
@@ -16,18 +17,19 @@ def create_inst(school: schemas.CollegeCreate, db: Session = Depends(get_db)):
     db.add(school)
     db.commit()
     create_unit(db,school)
+    hierarchy.invalidate()
     db.refresh(new_school)
     return new_school
 
 @router.get("/schools/{school_id}")
-def retrieve_school(school_id: int, db: Session = Depends(get_db)):
+def retrieve_school(school_id: int, db: Session = Depends(get_read_db)):
     school = db.query(models.School).filter(models.School.id == school_id).first()
     if school is None:
         raise HTTPException(status_code=404, detail=f"Unit with id {school_id} not found")
     return school
 
 @router.get("/schools/")
-def retrieve_school(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def retrieve_school(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
     schools=db.query(models.School).offset(skip).limit(limit).all()
     if schools is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No unit found")
@@ -41,6 +43,7 @@ def update_inst(school_id: int, unit: schemas.UnitCreate, db: Session = Depends(
     for key, value in unit.model_dump().items():
         setattr(school, key, value)
     db.commit()
+    hierarchy.invalidate()
     db.refresh(school)
     return school
 
@@ -51,4 +54,5 @@ def delete_school(school_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Unit not found")
     db.delete(school)
     db.commit()
+    hierarchy.invalidate()
     return {"message": "Unit deleted successfully"}
@@ -1,197 +1,127 @@
-from fastapi import APIRouter, FastAPI, HTTPException, Depends, status
-from sqlalchemy.exc import OperationalError
-from sqlalchemy import func
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, dependencies
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Response, status
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Union
+from .. import models, schemas, dependencies, tally
+from ..ballot import ballot
+from ..ingest import already_voted, vote_writer
 from udsm.authentication import oauth2
-from ..database import get_db, engine
+from ..database import get_async_db, get_async_read_db
+from ..pagination import Page
+from ..query_budget import query_budget
+from ..admission import vote_concurrency, vote_rate_limit
 
 
 router=APIRouter(tags=['Votes'])
 
-@router.post("/votes/", response_model=schemas.Vote)
-def create_vote(
+# list routes read these columns as rows instead of hydrating ORM objects
+VOTE_COLUMNS = (models.Vote.id, models.Vote.voter_id, models.Vote.votee_id, models.Vote.category)
+
+@router.post("/votes/", response_model=schemas.Vote, dependencies=[Depends(vote_rate_limit), Depends(vote_concurrency)])
+@query_budget(5)
+async def create_vote(
     vote: schemas.Vote,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(oauth2.get_current_user)
 ):
-    dependencies.check_voting_period(db=db)
-    # Check if the user has already voted in this category
-    vote_exist = db.query(models.Vote).filter_by(voter_id=current_user['id'], category=vote.category).first()
-    if vote_exist:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Already voted in this category")
-    
-    # Check if the votee is valid
-    votee = db.query(models.Worker).filter_by(id=vote.votee_id, category=vote.category, department_id=current_user['department_id'], unit_id=current_user['unit_id']).first()
-    if not votee:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Votee is not of {vote.category} category")
-    
-    top_workers = db.query(models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .join(models.Worker, models.Result.worker_id == models.Worker.id, isouter=True)\
-                .filter(
-                    models.Worker.category == vote.category,
-                    models.Worker.department_id == current_user['department_id'],
-                    models.Worker.unit_id == current_user['unit_id']
-                )\
-                .group_by(models.Result.id, models.Result.worker_id,models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .order_by(models.Result.percentage.desc()).limit(3)\
-                .all()
-
-    if not any(result.email == votee.email for result in top_workers):
+    await db.run_sync(dependencies.check_voting_period)
+    # Check the votee is on the ballot of the voter's unit, department and category
+    if not await db.run_sync(ballot.is_eligible, current_user['unit_id'], current_user['department_id'], vote.category, vote.votee_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Votee is not eligible to be voted")
-    # Create and save the new vote
-    new_vote = models.Vote(**vote.model_dump(), voter_id=current_user['id'], department_id=current_user['department_id'], unit_id=current_user['unit_id'])
-    db.add(new_vote)
-    db.commit()
-    db.refresh(new_vote)
-    return new_vote
+    # Release the session and hand the vote to the batching writer, it returns once the vote is committed.
+    # A second vote in the same category is refused by the unique constraint, not by a lookup
+    await db.close()
+    return await vote_writer.submit({**vote.model_dump(), "voter_id": current_user['id'], "department_id": current_user['department_id'], "unit_id": current_user['unit_id']})
 
 @router.get("/votes/", response_model=List[schemas.VoteOut])
-def get_votes(db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    votes = db.query(models.Vote).all()
+@query_budget(1)
+async def get_votes(response: Response, page: Page = Depends(), db: AsyncSession = Depends(get_async_db), current_user=Depends(oauth2.get_current_user)):
+    votes = page.finish((await db.execute(page.apply(select(*VOTE_COLUMNS), models.Vote.id))).all(), response)
     if not votes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No votes found")
     return votes
 
 @router.get("/votes/by-voter/{voter_id}", response_model=List[schemas.VoteOut])
-def get_votes_by_voter(voter_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    votes = db.query(models.Vote).filter_by(voter_id=voter_id).all()
+async def get_votes_by_voter(voter_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(oauth2.get_current_user)):
+    votes = (await db.execute(select(*VOTE_COLUMNS).filter_by(voter_id=voter_id))).all()
     if not votes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No votes found for this voter")
     return votes
 
 
 @router.get("/votes/by-category/{category}", response_model=List[schemas.VoteOut])
-def get_votes_by_category(category: str, db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    votes = db.query(models.Vote).filter_by(category=category, department_id=current_user['department_id'], unit_id=current_user['unit_id']).all()
+@query_budget(1)
+async def get_votes_by_category(category: str, response: Response, page: Page = Depends(), db: AsyncSession = Depends(get_async_db), current_user=Depends(oauth2.get_current_user)):
+    query = select(*VOTE_COLUMNS).filter_by(category=category, department_id=current_user['department_id'], unit_id=current_user['unit_id'])
+    votes = page.finish((await db.execute(page.apply(query, models.Vote.id))).all(), response)
     if not votes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No votes found for this category")
     return votes
 
-@router.put("/votes/{vote_id}", response_model=schemas.Vote)
-def update_vote(vote_id: int, vote: schemas.Vote, db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    existing_vote = db.query(models.Vote).filter_by(id=vote_id, voter_id=current_user['id']).first()
+@router.put("/votes/{vote_id}", response_model=schemas.Vote, dependencies=[Depends(vote_rate_limit), Depends(vote_concurrency)])
+@query_budget(6)
+async def update_vote(vote_id: int, vote: schemas.Vote, db: AsyncSession = Depends(get_async_db), current_user=Depends(oauth2.get_current_user)):
+    existing_vote = (await db.execute(select(models.Vote).filter_by(id=vote_id, voter_id=current_user['id']))).scalars().first()
     if not existing_vote:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vote not found or not authorized")
 
-    # Ensure the new votee is valid and eligible
-    votee = db.query(models.Worker).filter_by(id=vote.votee_id, category=vote.category).first()
-    if not votee:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Votee is not of {vote.category} category")
-    
-
-    top_workers = db.query(models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .join(models.Worker, models.Result.worker_id == models.Worker.id, isouter=True)\
-                .filter(
-                    models.Worker.category == vote.category,
-                    models.Worker.department_id == current_user['department_id'],
-                    models.Worker.unit_id == current_user['unit_id']
-                )\
-                .group_by(models.Result.id, models.Result.worker_id,models.Result,models.Worker.id, models.Worker.email, models.Worker.category, models.Worker.name)\
-                .order_by(models.Result.percentage.desc()).limit(3)\
-                .all()
-
-    if not any(result.email == votee.email for result in top_workers):
+    # Ensure the new votee is on the ballot
+    if not await db.run_sync(ballot.is_eligible, current_user['unit_id'], current_user['department_id'], vote.category, vote.votee_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Votee is not eligible to be voted")
 
-    # Update the vote
+    # Update the vote, moving its count to the new votee
+    await db.run_sync(tally.retract_vote, existing_vote)
     existing_vote.votee_id = vote.votee_id
     existing_vote.category = vote.category
-    db.commit()
-    db.refresh(existing_vote)
+    await db.run_sync(tally.record_vote, existing_vote)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # moved into a category the voter already voted in
+        await db.rollback()
+        raise already_voted()
+    await db.refresh(existing_vote)
     return existing_vote
 
 
-@router.delete("/votes/{vote_id}", response_model=dict)
-def delete_vote(vote_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    vote = db.query(models.Vote).filter_by(id=vote_id, voter_id=current_user['id']).first()
+@router.delete("/votes/{vote_id}", response_model=dict, dependencies=[Depends(vote_rate_limit), Depends(vote_concurrency)])
+async def delete_vote(vote_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(oauth2.get_current_user)):
+    vote = (await db.execute(select(models.Vote).filter_by(id=vote_id, voter_id=current_user['id']))).scalars().first()
     if not vote:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vote not found or not authorized")
-    db.delete(vote)
-    db.commit()
+    await db.run_sync(tally.retract_vote, vote)
+    await db.delete(vote)
+    await db.commit()
     return {"detail": "Vote successfully deleted"}
 
 
 
-@router.get("/results")
-def compute_vote_results(db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
-    
-    try:
-        # Clear the results table
-        db.query(models.VoteResult).delete()
-        db.commit()
-    except OperationalError:
-        # Handle exception if the table does not exist
-        pass
-
+@router.get("/results", response_model=List[Union[schemas.VoteResultOut, schemas.CategoryMessage]])
+@query_budget(2)
+async def compute_vote_results(db: AsyncSession = Depends(get_async_read_db), current_user=Depends(oauth2.get_current_user)):
     categories = ["junior", "senior", "administrative"]
     formatted_results = []
 
-    for category in categories:
-        # Step 1: Retrieve the total number of votes in the specified category
-        total_votes = db.query(models.Vote).filter(models.Vote.category == category).count()
-        print(total_votes)
+    # Read the live tallies, no recount and no writes
+    totals = await db.run_sync(tally.category_totals)
+    winners = await db.run_sync(tally.unit_winners, current_user['unit_id'], totals)
 
-        if total_votes == 0:
+    for category in categories:
+        if not totals.get(category):
             formatted_results.append({
                 "category": category,
                 "message": "No votes found in this category"
             })
             continue
 
-        # Step 3: Calculate results for each worker in the specified category
-        vote_counts = db.query(
-            models.Vote.votee_id, 
-            func.count(models.Vote.votee_id).label('total_votee_votes')
-        ).filter(
-            models.Vote.category == category
-        ).group_by(
-            models.Vote.votee_id
-        ).all()
-        
-        for votee_id, total_votee_votes in vote_counts:
-            # Calculate percentage for the worker
-            percentage = round((total_votee_votes / total_votes) * 100, 2)
-            
-            # Store the result in the database
-            db_result = models.VoteResult(worker_id=votee_id, percentage=percentage)
-            db.add(db_result)
-
-        db.commit()
-
-        # Step 4: Retrieve results along with worker information for the specified category
-        results = db.query(
-            models.VoteResult, 
-            models.Worker.email, 
-            models.Worker.category,
-            models.Worker.name
-        ).join(
-            models.Worker, 
-            models.VoteResult.worker_id == models.Worker.id, 
-            isouter=True
-        ).filter(
-            models.Worker.category == category,
-           
-            models.Worker.unit_id == current_user['unit_id']
-        ).group_by(
-            models.VoteResult.id, 
-            models.VoteResult.worker_id, 
-            models.Worker.email, 
-            models.Worker.category,
-            models.Worker.name
-        ).order_by(
-            models.VoteResult.percentage.desc()
-        ).all()
-
-        # Append the winner to the formatted results
-        if results:
-            result, email, worker_category, name = results[0]
+        winner = winners.get(category)
+        if winner:
             formatted_results.append({
-                "name": name,
-                "category": worker_category,
-                "email": email,
-                "percentage": result.percentage,
+                "name": winner["name"],
+                "category": category,
+                "email": winner["email"],
+                "percentage": winner["percentage"],
             })
         else:
             formatted_results.append({
@@ -1,12 +1,25 @@
-from fastapi import status, HTTPException,Depends, APIRouter
-
+import csv
+import io
+import orjson
+from fastapi import status, HTTPException,Depends, APIRouter, File, Response, UploadFile
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from .. import models, schemas
 from udsm.authentication import utils, oauth2
-from ..database import  get_db
+from ..database import  get_db, get_read_db
+from ..pagination import Page
+from .schedule import is_admin
 
 router=APIRouter(tags=['Workers'],)
 
+# list routes read these columns as rows, the password hash is never loaded
+WORKER_COLUMNS = (
+    models.Worker.id, models.Worker.role, models.Worker.email, models.Worker.name,
+    models.Worker.category, models.Worker.unit_id, models.Worker.department_id
+)
+
 
 @router.post("/workers", response_model=schemas.WorkerOut)
 def create_worker(worker:schemas.Worker, db: Session=Depends(get_db), current_user = Depends(oauth2.get_current_user)):
@@ -25,17 +38,124 @@ def create_worker(worker:schemas.Worker, db: Session=Depends(get_db), current_us
              return new_worker
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"the email already exist, it should be unique")
 
+IMPORT_BATCH_SIZE = 500
+
+
+def read_import_rows(upload: UploadFile):
+    # Stream (row number, raw dict) pairs from a CSV or NDJSON upload
+    text = io.TextIOWrapper(upload.file, encoding="utf-8")
+    if (upload.filename and upload.filename.lower().endswith(".csv")) or upload.content_type == "text/csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, {key: (value if value != "" else None) for key, value in row.items()}
+    else:
+        for row_number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    yield row_number, orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    yield row_number, None
+
+
+def import_batch(db: Session, batch, seen_emails: set, errors: list):
+    workers = []
+    for row_number, raw in batch:
+        if not isinstance(raw, dict):
+            errors.append({"row": row_number, "email": None, "error": "Row is not a valid record"})
+            continue
+        # csv.DictReader keeps the fields past the header under None
+        if None in raw:
+            errors.append({"row": row_number, "email": raw.get("email"), "error": "Row has more fields than the header"})
+            continue
+        try:
+            worker = schemas.Worker(**raw)
+        except ValidationError as e:
+            errors.append({"row": row_number, "email": raw.get("email"), "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+            continue
+        except TypeError as e:
+            errors.append({"row": row_number, "email": raw.get("email"), "error": str(e)})
+            continue
+        if worker.email in seen_emails:
+            errors.append({"row": row_number, "email": worker.email, "error": "Duplicate email in this import"})
+            continue
+        seen_emails.add(worker.email)
+        workers.append((row_number, worker))
+
+    if not workers:
+        return 0
+
+    # Check emails, units and departments for the whole batch at once
+    existing_emails = {email for email, in db.query(models.Worker.email).filter(models.Worker.email.in_([w.email for _, w in workers]))}
+    unit_ids = {unit_id for unit_id, in db.query(models.Unit.id).filter(models.Unit.id.in_({w.unit_id for _, w in workers}))}
+    department_ids = {department_id for department_id, in db.query(models.Department.id).filter(models.Department.id.in_({w.department_id for _, w in workers if w.department_id is not None}))}
+
+    valid = []
+    for row_number, worker in workers:
+        if worker.email in existing_emails:
+            errors.append({"row": row_number, "email": worker.email, "error": "the email already exist, it should be unique"})
+        elif worker.unit_id not in unit_ids:
+            errors.append({"row": row_number, "email": worker.email, "error": f"Unit with id {worker.unit_id} does not exist"})
+        elif worker.department_id is not None and worker.department_id not in department_ids:
+            errors.append({"row": row_number, "email": worker.email, "error": f"Department with id {worker.department_id} does not exist"})
+        else:
+            valid.append((row_number, worker))
+
+    if not valid:
+        return 0
+
+    hashed_passwords = utils.hash_passwords([worker.password for _, worker in valid])
+    rows = []
+    for (_, worker), hashed_password in zip(valid, hashed_passwords):
+        row = worker.model_dump()
+        row["password"] = hashed_password
+        row["role"] = row["role"] or "user"
+        rows.append(row)
+
+    # An email taken by another writer since the check above is skipped and reported, any
+    # other violation (say a unit deleted meanwhile) fails only this batch
+    stmt = insert(models.Worker).values(rows).on_conflict_do_nothing(index_elements=["email"]).returning(models.Worker.email)
+    try:
+        inserted = {email for email, in db.execute(stmt)}
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        errors.extend({"row": row_number, "email": worker.email, "error": "Could not be saved, the batch was rolled back"} for row_number, worker in valid)
+        return 0
+
+    for row_number, worker in valid:
+        if worker.email not in inserted:
+            errors.append({"row": row_number, "email": worker.email, "error": "the email already exist, it should be unique"})
+    return len(inserted)
+
+
+@router.post("/workers/import")
+def import_workers(file: UploadFile = File(...), db: Session=Depends(get_db), current_user = Depends(oauth2.get_current_user)):
+    is_admin(current_user=current_user)
+
+    imported = 0
+    errors = []
+    seen_emails = set()
+    batch = []
+    for row in read_import_rows(file):
+        batch.append(row)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            imported += import_batch(db, batch, seen_emails, errors)
+            batch = []
+    if batch:
+        imported += import_batch(db, batch, seen_emails, errors)
+
+    return {"imported": imported, "failed": len(errors), "errors": errors}
+
 @router.get("/workers/",response_model=list[schemas.WorkerOut])
-def get_workers(db: Session=Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    workers=db.query(models.Worker).all()
+def get_workers(response: Response, page: Page = Depends(), db: Session=Depends(get_read_db), current_user = Depends(oauth2.get_current_user)):
+    workers=page.finish(page.apply(db.query(*WORKER_COLUMNS), models.Worker.id).all(), response)
     if workers is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"No workkers exist yet")
         
     return workers
 
 @router.get("/workers/by-category/{category}",response_model=list[schemas.WorkerOut])
-def get_worker(category:str, db: Session=Depends(get_db), current_user = Depends(oauth2.get_current_user)):
-    workers=db.query(models.Worker).filter(models.Worker.category==category, models.Worker.unit_id==current_user['unit_id'], models.Worker.department_id==current_user['department_id']).all()
+def get_worker(category:str, db: Session=Depends(get_read_db), current_user = Depends(oauth2.get_current_user)):
+    workers=db.query(*WORKER_COLUMNS).filter(models.Worker.category==category, models.Worker.unit_id==current_user['unit_id'], models.Worker.department_id==current_user['department_id']).all()
     if workers is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"No workkers exist yet")
         
@@ -43,7 +163,7 @@ def get_worker(category:str, db: Session=Depends(get_db), current_user = Depends
 
 
 @router.get("/workers/{id}",response_model=schemas.WorkerOut)
-def get_user(id:int, db: Session=Depends(get_db), current_user = Depends(oauth2.get_current_user)):
+def get_user(id:int, db: Session=Depends(get_read_db), current_user = Depends(oauth2.get_current_user)):
     worker=db.query(models.Worker).filter(models.Worker.id==id).first()
     if not worker:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Worker with id {id} do not exist")
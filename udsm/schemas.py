@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field, field_validator, field_serializer
 
@@ -141,6 +141,51 @@ class VoteOut(Vote):
     voter_id: int
     id:int
 
+class NominationOut(Nomination):
+    id: int
+    nominator_id: int
+    department_id: Optional[int] = None
+    unit_id: int
+    created_at: datetime
+
+
+# Results, field order is the order of the JSON keys
+class VoteResultOut(BaseModel):
+    name: str
+    category: str
+    email: str
+    percentage: float
+
+class BestWorkerOut(BaseModel):
+    name: str
+    email: str
+    category: str
+    percentage: float
+
+class NominationResultOut(BaseModel):
+    id: int
+    name: str
+    category: str
+    email: str
+    percentage: float
+
+class CategoryMessage(BaseModel):
+    category: str
+    message: str
+
+class LeaderboardEntry(BaseModel):
+    unit_id: int
+    unit_name: str
+    department_id: Optional[int] = None
+    department_name: Optional[str] = None
+    category: str
+    rank: int
+    worker_id: int
+    name: str
+    email: str
+    votes: int
+    percentage: float
+
 
     # Data model for a nomination
 class Worker(BaseModel):
@@ -0,0 +1,110 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+
+# Nomination results are published as immutable, versioned snapshots per
+# (unit, department, category). Publishing writes a complete new version and only then
+# moves the head pointer, so readers always see a whole result set and never rebuild it.
+
+# versions kept per key besides the current one
+KEEP_PREVIOUS = 1
+
+
+def publish(db: Session, unit_id: int, department_id, category: str, entries):
+    head = db.query(models.ResultSnapshotHead).filter(
+        models.ResultSnapshotHead.unit_id == unit_id,
+        models.ResultSnapshotHead.department_id == department_id,
+        models.ResultSnapshotHead.category == category
+    ).with_for_update().first()
+
+    version = 1
+    if head:
+        version = db.query(models.ResultSnapshot.version).filter(models.ResultSnapshot.id == head.snapshot_id).scalar() + 1
+
+    snapshot = models.ResultSnapshot(version=version, unit_id=unit_id, department_id=department_id, category=category)
+    db.add(snapshot)
+    db.flush()
+
+    db.bulk_insert_mappings(models.ResultSnapshotEntry, [
+        {"snapshot_id": snapshot.id, "worker_id": worker_id, "percentage": percentage}
+        for worker_id, percentage in entries
+    ])
+
+    # Swap the pointer to the complete new version. Without a head there is no row to lock,
+    # so a concurrent first publish of the same key lands on the head's unique index and
+    # the later commit wins
+    stmt = insert(models.ResultSnapshotHead).values(snapshot_id=snapshot.id, unit_id=unit_id, department_id=department_id, category=category)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.ResultSnapshotHead.unit_id, func.coalesce(models.ResultSnapshotHead.department_id, 0), models.ResultSnapshotHead.category],
+        set_={"snapshot_id": stmt.excluded.snapshot_id}
+    ))
+
+    db.query(models.ResultSnapshot).filter(
+        models.ResultSnapshot.unit_id == unit_id,
+        models.ResultSnapshot.department_id == department_id,
+        models.ResultSnapshot.category == category,
+        models.ResultSnapshot.version <= version - 1 - KEEP_PREVIOUS
+    ).delete(synchronize_session=False)
+    return snapshot
+
+
+def publish_nomination_results(db: Session):
+    # Count distinct nominators per (unit, department, category)
+    nominators = db.query(
+        models.Worker.unit_id,
+        models.Worker.department_id,
+        models.Nomination.category,
+        func.count(func.distinct(models.Nomination.nominator_id))
+    ).join(models.Worker, models.Nomination.nominator_id == models.Worker.id)\
+     .group_by(models.Worker.unit_id, models.Worker.department_id, models.Nomination.category)\
+     .all()
+    total_workers = {(unit_id, department_id, category): count for unit_id, department_id, category, count in nominators}
+
+    # Sum the points of every nominee
+    points = db.query(
+        models.Worker.unit_id,
+        models.Worker.department_id,
+        models.Worker.category,
+        models.Nomination.nominee_id,
+        func.sum(models.Nomination.weight)
+    ).join(models.Worker, models.Nomination.nominee_id == models.Worker.id)\
+     .group_by(models.Worker.unit_id, models.Worker.department_id, models.Worker.category, models.Nomination.nominee_id)\
+     .all()
+
+    results = {}
+    for unit_id, department_id, category, worker_id, worker_total_points in points:
+        key = (unit_id, department_id, category)
+        if not total_workers.get(key):
+            continue
+        overall_total_points = 6 * total_workers[key]
+        percentage = round((worker_total_points / overall_total_points) * 100, 2)
+        results.setdefault(key, []).append((worker_id, percentage))
+
+    for (unit_id, department_id, category), entries in results.items():
+        publish(db, unit_id, department_id, category, entries)
+    db.commit()
+    return len(results)
+
+
+def latest(db: Session, unit_id: int, department_id, category: str = None, limit: int = None):
+    # Entries of the current snapshot with worker details, best first
+    query = db.query(
+        models.ResultSnapshotEntry.percentage,
+        models.ResultSnapshotHead.category,
+        models.Worker.id,
+        models.Worker.email,
+        models.Worker.name
+    ).join(models.ResultSnapshotHead, models.ResultSnapshotHead.snapshot_id == models.ResultSnapshotEntry.snapshot_id)\
+     .join(models.Worker, models.ResultSnapshotEntry.worker_id == models.Worker.id)\
+     .filter(
+         models.ResultSnapshotHead.unit_id == unit_id,
+         models.ResultSnapshotHead.department_id == department_id
+     )
+
+    if category is not None:
+        query = query.filter(models.ResultSnapshotHead.category == category)
+    query = query.order_by(models.ResultSnapshotEntry.percentage.desc(), models.Worker.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
@@ -0,0 +1,91 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy.orm import Session
+from . import models
+
+# Storage for nominations a worker has staged but not yet committed. A staged
+# nomination is kept as a compact (category, nominee_id, weight) tuple, and a
+# worker's staged set is evicted ttl seconds after they last staged anything.
+#
+# "database" shares the staged sets between all worker processes, "memory" is a
+# single-process stand-in for development.
+
+StagedNomination = Tuple[str, int, int]
+
+
+class MemoryStagingBackend:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[float, List[StagedNomination]]] = {}
+
+    def load(self, db: Session, user_id: int) -> List[StagedNomination]:
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(user_id)
+            return list(entry[1]) if entry else []
+
+    def add(self, db: Session, user_id: int, staged: StagedNomination):
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(user_id)
+            nominations = entry[1] if entry else []
+            nominations.append(staged)
+            self._entries[user_id] = (time.monotonic(), nominations)
+
+    def clear(self, db: Session, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for user_id in [user_id for user_id, (staged_at, _) in self._entries.items() if staged_at < cutoff]:
+            del self._entries[user_id]
+
+
+class DatabaseStagingBackend:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, db: Session, user_id: int) -> List[StagedNomination]:
+        rows = db.query(models.StagedNomination.category, models.StagedNomination.nominee_id, models.StagedNomination.weight)\
+                 .filter(models.StagedNomination.user_id == user_id, models.StagedNomination.staged_at >= self._cutoff())\
+                 .order_by(models.StagedNomination.id)\
+                 .all()
+        return [tuple(row) for row in rows]
+
+    def add(self, db: Session, user_id: int, staged: StagedNomination):
+        # Drop abandoned sets, then refresh the worker's own set so it expires as a whole
+        db.query(models.StagedNomination)\
+          .filter(models.StagedNomination.staged_at < self._cutoff())\
+          .delete(synchronize_session=False)
+        db.query(models.StagedNomination)\
+          .filter(models.StagedNomination.user_id == user_id)\
+          .update({models.StagedNomination.staged_at: datetime.now(timezone.utc)}, synchronize_session=False)
+
+        category, nominee_id, weight = staged
+        db.add(models.StagedNomination(user_id=user_id, category=category, nominee_id=nominee_id, weight=weight))
+        db.commit()
+
+    def clear(self, db: Session, user_id: int):
+        # part of the caller's transaction, committed with the nominations it turned into
+        db.query(models.StagedNomination)\
+          .filter(models.StagedNomination.user_id == user_id)\
+          .delete(synchronize_session=False)
+
+    def _cutoff(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+
+
+backends = {
+    "memory": MemoryStagingBackend,
+    "database": DatabaseStagingBackend,
+}
+
+
+def create_backend(name: str, ttl_seconds: int):
+    if name not in backends:
+        raise ValueError(f"Unknown nomination staging backend '{name}', expected one of {', '.join(backends)}")
+    return backends[name](ttl_seconds)
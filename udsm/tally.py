@@ -0,0 +1,79 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+
+# Per-candidate vote counters. They are bumped in the same transaction as the vote
+# itself, so reading results never has to recount the votes table.
+
+
+def record_vote(db: Session, vote: models.Vote):
+    stmt = insert(models.VoteTally).values(
+        worker_id=vote.votee_id,
+        category=vote.category,
+        unit_id=vote.unit_id,
+        department_id=vote.department_id,
+        votes=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint='_vote_tally_uc',
+        set_={"votes": models.VoteTally.votes + 1}
+    )
+    db.execute(stmt)
+
+
+def retract_vote(db: Session, vote: models.Vote):
+    db.query(models.VoteTally)\
+      .filter(models.VoteTally.worker_id == vote.votee_id, models.VoteTally.category == vote.category)\
+      .update({models.VoteTally.votes: models.VoteTally.votes - 1}, synchronize_session=False)
+
+
+def category_totals(db: Session):
+    # Total votes cast in each category, the denominator of every percentage
+    rows = db.query(models.VoteTally.category, func.sum(models.VoteTally.votes))\
+             .group_by(models.VoteTally.category)\
+             .all()
+    return {category: total or 0 for category, total in rows}
+
+
+def unit_winners(db: Session, unit_id: int, totals: dict = None):
+    # Leading candidate of every category in a unit, keyed by category
+    if totals is None:
+        totals = category_totals(db)
+
+    rows = db.query(models.VoteTally.category, models.VoteTally.votes, models.Worker.name, models.Worker.email)\
+             .join(models.Worker, models.VoteTally.worker_id == models.Worker.id)\
+             .filter(
+                 models.Worker.unit_id == unit_id,
+                 models.Worker.category == models.VoteTally.category,
+                 models.VoteTally.votes > 0
+             )\
+             .all()
+
+    winners = {}
+    for category, votes, name, email in rows:
+        if category not in winners or votes > winners[category]["votes"]:
+            winners[category] = {"name": name, "email": email, "votes": votes}
+
+    for category, winner in winners.items():
+        winner["percentage"] = round((winner.pop("votes") / totals[category]) * 100, 2)
+    return winners
+
+
+def rebuild(db: Session):
+    # Recount the tallies from the votes table, e.g. after upgrading an existing database
+    db.query(models.VoteTally).delete(synchronize_session=False)
+    counts = db.query(
+        models.Vote.votee_id,
+        models.Vote.category,
+        func.min(models.Vote.unit_id),
+        func.min(models.Vote.department_id),
+        func.count(models.Vote.id)
+    ).group_by(models.Vote.votee_id, models.Vote.category).all()
+
+    db.bulk_insert_mappings(models.VoteTally, [
+        {"worker_id": worker_id, "category": category, "unit_id": unit_id, "department_id": department_id, "votes": votes}
+        for worker_id, category, unit_id, department_id, votes in counts
+    ])
+    db.commit()
+    return len(counts)